@@ -1,6 +1,26 @@
+import numpy as np
 import pandas as pd
 import json
 import os
+from functools import lru_cache
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
 
 # --- 1. The Golden Dictionary (Standardized Activities) ---
 # این دیکشنری تعیین می‌کند چه کارت‌هایی در سیستم وجود داشته باشند.
@@ -51,31 +71,83 @@ TRUSTEE_TO_GROUP = {
     "معاونت فرهنگی اجتماعی": "ADMIN_WELFARE", # یا گروه جدید
 }
 
+# ستون‌هایی که از فایل سرمایه‌ای خوانده می‌شوند
+SOURCE_COLUMNS = {'نوع ردیف', 'متولی', 'شرح ردیف'}
+
+# عنوان هر سامانه
+SUBSYSTEM_TITLES = {
+    "URBAN_SERVICES": "سامانه خدمات شهری",
+    "CIVIL_TRAFFIC": "سامانه عمران و ترافیک",
+    "ADMIN_FINANCE": "سامانه اداری و مالی",
+    "OTHER": "سایر",
+}
+
 def normalize_text(text):
     if pd.isna(text): return ""
     return str(text).replace("ي", "ی").replace("ك", "ک").strip()
 
+def normalize_column(df, col):
+    """نسخه ستونی normalize_text؛ ستون غایب مثل row.get به رشته خالی تبدیل می‌شود."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index)
+    return (
+        df[col].fillna("").astype(str)
+        .str.replace("ي", "ی", regex=False).str.replace("ك", "ک", regex=False)
+        .str.strip()
+    )
+
+# (کلیدواژه، عنوان استاندارد) به ترتیب دیکشنری، و دسته «سایر» هر گروه - یک‌بار ساخته می‌شود
+KEYWORD_RULES = {
+    group_key: [(kw, title) for title, keywords in rules.items() for kw in keywords]
+    for group_key, rules in STANDARD_ACTIVITIES_MAP.items()
+}
+FALLBACK_TITLES = {
+    group_key: next((k for k in rules.keys() if "سایر" in k), "سایر موارد")
+    for group_key, rules in STANDARD_ACTIVITIES_MAP.items()
+}
+
+def _build_automaton(rules):
+    """یک اتوماتای Aho-Corasick برای همه کلیدواژه‌های یک گروه؛ مقدار هر کلید (اولویت، عنوان) است."""
+    automaton = ahocorasick.Automaton()
+    for priority, (kw, title) in enumerate(rules):
+        if kw not in automaton:
+            automaton.add_word(kw, (priority, title))
+    automaton.make_automaton()
+    return automaton
+
+# کلیدواژه‌های هر گروه در یک گذر روی متن پیدا می‌شوند
+KEYWORD_AUTOMATA = {
+    group_key: _build_automaton(rules)
+    for group_key, rules in KEYWORD_RULES.items()
+    if AHOCORASICK_AVAILABLE and rules
+}
+
+@lru_cache(maxsize=4096)
+def _match_standard_activity(desc_clean, group_key):
+    # 1. جستجو در کلیدواژه‌ها (مثل پیمایش ترتیبی، اولین کلیدواژه به ترتیب دیکشنری برنده است)
+    automaton = KEYWORD_AUTOMATA.get(group_key)
+    if automaton is not None:
+        hits = [value for _, value in automaton.iter(desc_clean)]
+        if hits:
+            return min(hits)[1]
+    else:
+        for kw, standard_title in KEYWORD_RULES[group_key]:
+            if kw in desc_clean:
+                return standard_title
+    
+    # 2. اگر پیدا نشد -> تور ایمنی
+    return FALLBACK_TITLES[group_key]
+
 def find_standard_activity(description, group_key):
     """
     متن شرح را می‌گیرد و سعی می‌کند با دیکشنری استاندارد مچ کند.
     اگر نشد، دسته 'سایر' را برمی‌گرداند.
+    شرح‌های تکراری از کش خوانده می‌شوند.
     """
     if group_key not in STANDARD_ACTIVITIES_MAP:
         return "سایر فعالیت‌ها" # خیلی عمومی
     
-    group_rules = STANDARD_ACTIVITIES_MAP[group_key]
-    desc_clean = normalize_text(description)
-    
-    # 1. جستجو در کلیدواژه‌ها
-    for standard_title, keywords in group_rules.items():
-        for kw in keywords:
-            if kw in desc_clean:
-                return standard_title
-    
-    # 2. اگر پیدا نشد -> تور ایمنی
-    # پیدا کردن کلید Catch-all که کلمه "سایر" دارد
-    fallback = next((k for k in group_rules.keys() if "سایر" in k), "سایر موارد")
-    return fallback
+    return _match_standard_activity(normalize_text(description), group_key)
 
 def generate_standardized_config():
     print("🚀 Starting Standardized Config Generation (Dictionary Based)...")
@@ -83,58 +155,49 @@ def generate_standardized_config():
     try:
         # فقط فایل سرمایه ای را برای تست لود می‌کنیم (چون مستمرها آنجاست)
         # اما شما می‌توانید هر دو را لود کنید
-        df = pd.read_excel('تملک دارایی سرمایه ای.xlsx', engine='openpyxl')
+        # فقط ستون‌های مورد استفاده خوانده می‌شوند (ستون غایب خطا نمی‌دهد)
+        df = pd.read_excel(
+            'تملک دارایی سرمایه ای.xlsx',
+            engine=EXCEL_READER_ENGINE,
+            usecols=lambda c: c in SOURCE_COLUMNS,
+            dtype=str,
+        )
         print(f"✅ Loaded Data: {len(df)} rows")
     except Exception as e:
         print(f"❌ Error: {e}")
         return
 
-    # ساختار نهایی
-    subsystems_config = {}
+    # فقط مستمرها (طبق درخواست قبلی)
+    df = df[normalize_column(df, 'نوع ردیف') == 'مستمر']
+    trustee = normalize_column(df, 'متولی')
+    description = normalize_column(df, 'شرح ردیف')
 
-    for _, row in df.iterrows():
-        # فقط مستمرها (طبق درخواست قبلی)
-        if normalize_text(row.get('نوع ردیف')) != 'مستمر':
-            continue
+    # 1. تشخیص گروه (Subsystem) - شرط‌ها به همان ترتیب if/elif قبلی
+    conditions = [
+        trustee.str.contains("خدمات", regex=False),
+        trustee.str.contains("عمران", regex=False) | trustee.str.contains("حمل", regex=False),
+        trustee.str.contains("برنامه", regex=False) | trustee.str.contains("مالی", regex=False),
+    ]
+    rows = pd.DataFrame({
+        "sys_code": np.select(conditions, ["URBAN_SERVICES", "CIVIL_TRAFFIC", "ADMIN_FINANCE"], default="OTHER"),
+        "group_key": np.select(conditions, ["URBAN_SERVICES", "CIVIL_TRAFFIC", "ADMIN_WELFARE"], default="ADMIN_WELFARE"),
+        "description": description.to_numpy(),
+    }).drop_duplicates()
 
-        trustee = normalize_text(row.get('متولی'))
-        description = normalize_text(row.get('شرح ردیف'))
-        
-        # 1. تشخیص گروه (Subsystem)
-        group_key = "ADMIN_WELFARE" # پیش‌فرض
-        sys_code = "OTHER"
-        sys_title = "سایر"
-
-        if "خدمات" in trustee:
-            group_key = "URBAN_SERVICES"
-            sys_code = "URBAN_SERVICES"
-            sys_title = "سامانه خدمات شهری"
-        elif "عمران" in trustee or "حمل" in trustee:
-            group_key = "CIVIL_TRAFFIC"
-            sys_code = "CIVIL_TRAFFIC"
-            sys_title = "سامانه عمران و ترافیک"
-        elif "برنامه" in trustee or "مالی" in trustee:
-            group_key = "ADMIN_WELFARE"
-            sys_code = "ADMIN_FINANCE"
-            sys_title = "سامانه اداری و مالی"
-        
-        # 2. استانداردسازی فعالیت
-        std_activity_title = find_standard_activity(description, group_key)
-        
-        # 3. افزودن به لیست
-        if sys_code not in subsystems_config:
-            subsystems_config[sys_code] = {
-                "title": sys_title,
-                "activities": set()
-            }
-        
-        subsystems_config[sys_code]["activities"].add(std_activity_title)
+    # 2. استانداردسازی فعالیت - فقط یک‌بار برای هر شرح یکتا
+    rows["activity"] = [
+        find_standard_activity(desc, group_key)
+        for desc, group_key in zip(rows["description"], rows["group_key"])
+    ]
+
+    # 3. فعالیت‌های یکتای هر سامانه، به ترتیب اولین مشاهده
+    subsystem_activities = rows.groupby("sys_code", sort=False)["activity"].unique()
 
     # تبدیل به JSON نهایی
     final_json_list = []
-    for code, data in subsystems_config.items():
+    for code, activities in subsystem_activities.items():
         acts_list = []
-        for idx, act_title in enumerate(data['activities']):
+        for idx, act_title in enumerate(activities):
             acts_list.append({
                 "code": f"{code}_{idx+1}",
                 "title": act_title,
@@ -145,14 +208,18 @@ def generate_standardized_config():
         
         final_json_list.append({
             "code": code,
-            "title": data['title'],
+            "title": SUBSYSTEM_TITLES[code],
             "activities": acts_list
         })
 
     output = {"version": "3.0", "subsystems": final_json_list}
     
-    with open('app/config/config_master_v3.json', 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    if ORJSON_AVAILABLE:
+        with open('app/config/config_master_v3.json', 'wb') as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+    else:
+        with open('app/config/config_master_v3.json', 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
     
     print("✅ Config V3 Generated! All garbage titles are gone.")
 
@@ -16,13 +16,42 @@ Usage:
     python scripts/generate_config_v4_hybrid.py
 """
 
+import numpy as np
 import pandas as pd
 import json
 import os
-from collections import defaultdict
-from typing import Optional, List, Dict, Set
+import re
+from functools import wraps
+from itertools import groupby
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 
 # ============================================================
 # CONFIGURATION
@@ -35,12 +64,29 @@ CAPITAL_BUDGET_FILE = "تملک دارایی سرمایه ای.xlsx"
 # Output file
 OUTPUT_FILE = "app/config/config_master.json"
 
+# Parsed budget frames are cached here between runs (needs pyarrow);
+# bump CACHE_VERSION when the loaders change what they return
+CACHE_DIR = ".cache"
+CACHE_VERSION = 1
+
+# Arabic Yeh/Kaf -> Persian, for matching header names
+_PERSIAN_TRANS = str.maketrans({"ي": "ی", "ك": "ک"})
+
+# Header keywords of the only columns read from the budget files:
+# description, trustee, subject and row type
+SOURCE_COLUMN_KEYWORDS = [
+    ['شرح ردیف', 'شرح'],
+    ['متولی', 'متولي'],
+    ['موضوع'],
+    ['نوع ردیف'],
+]
+
 
 # ============================================================
 # THE 13 SUBSYSTEMS DEFINITION (STRICT - DO NOT GROUP)
 # ============================================================
 
-SUBSYSTEMS = {
+SUBSYSTEMS = MappingProxyType({
     "URBAN_PLANNING": {
         "code": "URBAN_PLANNING",
         "title": "سامانه شهرسازی",
@@ -153,7 +199,10 @@ SUBSYSTEMS = {
         "attachment_type": "upload",
         "order": 14
     }
-}
+})
+
+# Subsystem codes in display order, for the summary and the JSON output
+SUBSYSTEM_ORDER = tuple(sorted(SUBSYSTEMS, key=lambda code: SUBSYSTEMS[code]["order"]))
 
 
 # ============================================================
@@ -278,6 +327,51 @@ KEYWORD_TO_SUBSYSTEM = {
 }
 
 
+def _alternation(keywords: List[str]) -> re.Pattern:
+    """Compile a keyword list into a single literal alternation regex."""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+# Precompiled patterns for column-wise matching in process_dataframe.
+# Trustee patterns are grouped into consecutive runs of the same subsystem,
+# so the first matching run still follows dictionary order.
+TRUSTEE_RULES = [
+    (subsystem, _alternation([pattern for pattern, _ in run]))
+    for subsystem, run in groupby(TRUSTEE_TO_SUBSYSTEM.items(), key=itemgetter(1))
+]
+KEYWORD_PATTERNS = {subsystem: _alternation(kws) for subsystem, kws in KEYWORD_TO_SUBSYSTEM.items()}
+# Description rules per budget type (keyed by is_capital);
+# CONTRACTORS keywords only apply to capital budget
+DESCRIPTION_RULES = {
+    True: tuple(KEYWORD_PATTERNS.items()),
+    False: tuple((sub, pattern) for sub, pattern in KEYWORD_PATTERNS.items() if sub != "CONTRACTORS"),
+}
+CLEANING_PATTERNS = {title: _alternation(kws) for title, kws in CLEANING_MAP.items()}
+CLEANING_TITLES = np.array(list(CLEANING_PATTERNS), dtype=object)
+
+
+def _build_keyword_automaton():
+    """
+    One Aho-Corasick automaton over CLEANING_MAP and KEYWORD_TO_SUBSYSTEM.
+    Each keyword maps to its (kind, priority, label) entries, where priority
+    is the dictionary position, so a scan keeps the first-entry-wins order.
+    """
+    entries: Dict[str, Dict[str, Tuple[int, str]]] = {}
+    for kind, table in (("title", CLEANING_MAP), ("subsystem", KEYWORD_TO_SUBSYSTEM)):
+        for priority, (label, keywords) in enumerate(table.items()):
+            for kw in keywords:
+                entries.setdefault(kw, {}).setdefault(kind, (priority, label))
+    
+    automaton = ahocorasick.Automaton()
+    for kw, by_kind in entries.items():
+        automaton.add_word(kw, tuple((kind, priority, label) for kind, (priority, label) in by_kind.items()))
+    automaton.make_automaton()
+    return automaton
+
+
+KEYWORD_AUTOMATON = _build_keyword_automaton() if AHOCORASICK_AVAILABLE else None
+
+
 # ============================================================
 # UTILITY FUNCTIONS
 # ============================================================
@@ -289,21 +383,59 @@ def clean_text(text) -> str:
     return str(text).strip()
 
 
-def find_column(df: pd.DataFrame, keywords: List[str]) -> Optional[str]:
-    """Find a column containing any of the keywords."""
-    for col in df.columns:
-        col_str = str(col).strip()
+def clean_column(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+    """Column-wise clean_text; a missing column becomes empty strings."""
+    if not col:
+        return pd.Series("", index=df.index)
+    return df[col].fillna("").astype(str).str.strip()
+
+
+def column_index(columns) -> Dict[str, str]:
+    """Map normalized header text to column label, built once per DataFrame."""
+    index = {}
+    for col in columns:
+        index.setdefault(str(col).strip().translate(_PERSIAN_TRANS), col)
+    return index
+
+
+def find_column(col_index: Dict[str, str], keywords: List[str]) -> Optional[str]:
+    """Find a column (from column_index) containing any of the keywords."""
+    keywords = [kw.translate(_PERSIAN_TRANS) for kw in keywords]
+    for name, col in col_index.items():
         for kw in keywords:
-            if kw in col_str:
+            if kw in name:
                 return col
     return None
 
 
-def contains_any(text: str, keywords: List[str]) -> bool:
-    """Check if text contains any of the keywords."""
-    if not text:
-        return False
-    return any(kw in text for kw in keywords)
+def scan_keywords(description: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Find CLEANING_MAP and KEYWORD_TO_SUBSYSTEM hits in one automaton pass.
+    Returns (clean title, subsystem, subsystem ignoring CONTRACTORS), each
+    picked by dictionary order like the keyword loops, or None if no match.
+    """
+    title = subsystem = expense_subsystem = None
+    for _, entries in KEYWORD_AUTOMATON.iter(description):
+        for kind, priority, label in entries:
+            hit = (priority, label)
+            if kind == "title":
+                title = min(title, hit) if title else hit
+            else:
+                subsystem = min(subsystem, hit) if subsystem else hit
+                if label != "CONTRACTORS":
+                    expense_subsystem = min(expense_subsystem, hit) if expense_subsystem else hit
+    return tuple(hit[1] if hit else None for hit in (title, subsystem, expense_subsystem))
+
+
+def scan_column(descriptions: pd.Series) -> pd.DataFrame:
+    """scan_keywords for a whole column, scanning each distinct description once."""
+    unique_descs = descriptions.unique()
+    scanned = pd.DataFrame(
+        [scan_keywords(desc) for desc in unique_descs],
+        index=unique_descs,
+        columns=["title", "subsystem", "expense_subsystem"],
+    )
+    return scanned.reindex(descriptions.to_numpy())
 
 
 def get_clean_title(description: str) -> Optional[str]:
@@ -311,8 +443,10 @@ def get_clean_title(description: str) -> Optional[str]:
     Use CLEANING_MAP to get a clean title from description.
     Returns None if no keyword matches (will trigger fallback).
     """
-    for clean_title, keywords in CLEANING_MAP.items():
-        if contains_any(description, keywords):
+    if KEYWORD_AUTOMATON is not None:
+        return scan_keywords(description)[0]
+    for clean_title, pattern in CLEANING_PATTERNS.items():
+        if pattern.search(description):
             return clean_title
     return None
 
@@ -323,6 +457,13 @@ def get_fallback_title(subsystem_code: str) -> str:
     return f"سایر خدمات {persian_name}"
 
 
+FALLBACK_TITLES = {code: get_fallback_title(code) for code in SUBSYSTEMS}
+
+# Every title process_dataframe can produce. Titles are carried as int8
+# codes into this list; it is sorted so code order matches title order.
+TITLE_VOCAB = sorted(set(CLEANING_MAP) | set(FALLBACK_TITLES.values()))
+
+
 # ============================================================
 # SUBSYSTEM CLASSIFICATION (Waterfall Logic)
 # ============================================================
@@ -342,21 +483,24 @@ def classify_row_to_subsystem(row_data: dict, is_capital: bool) -> str:
     description = row_data.get('description', '')
     
     # Level 1: Trustee Check (Strongest Signal)
-    for trustee_pattern, subsystem in TRUSTEE_TO_SUBSYSTEM.items():
-        if trustee_pattern in trustee:
+    for subsystem, pattern in TRUSTEE_RULES:
+        if pattern.search(trustee):
             return subsystem
     
     # Level 2: Subject Check (specifically for Payroll)
-    if contains_any(subject, KEYWORD_TO_SUBSYSTEM.get("PAYROLL", [])):
+    if KEYWORD_PATTERNS["PAYROLL"].search(subject):
         return "PAYROLL"
     
     # Level 3: Description Keyword Mining
-    for subsystem, patterns in KEYWORD_TO_SUBSYSTEM.items():
-        # CONTRACTORS keywords only apply to capital budget
-        if subsystem == "CONTRACTORS" and not is_capital:
-            continue
-        if contains_any(description, patterns):
-            return subsystem
+    if KEYWORD_AUTOMATON is not None:
+        _, subsystem, expense_subsystem = scan_keywords(description)
+        matched = subsystem if is_capital else expense_subsystem
+        if matched:
+            return matched
+    else:
+        for subsystem, pattern in DESCRIPTION_RULES[is_capital]:
+            if pattern.search(description):
+                return subsystem
     
     # Level 4: Default Fallback
     if is_capital:
@@ -369,6 +513,49 @@ def classify_row_to_subsystem(row_data: dict, is_capital: bool) -> str:
 # DATA LOADING AND PROCESSING
 # ============================================================
 
+def cache_parquet(source_path: str):
+    """
+    Cache a loader's DataFrame as Parquet in CACHE_DIR.
+    The cache is reused while it is newer than source_path.
+    """
+    def decorator(loader):
+        cache_path = os.path.join(
+            CACHE_DIR, f"{os.path.basename(source_path)}.{loader.__name__}.v{CACHE_VERSION}.parquet"
+        )
+        
+        @wraps(loader)
+        def wrapper() -> Optional[pd.DataFrame]:
+            if (PARQUET_AVAILABLE and os.path.exists(source_path) and os.path.exists(cache_path)
+                    and os.path.getmtime(cache_path) >= os.path.getmtime(source_path)):
+                try:
+                    df = pd.read_parquet(cache_path, engine='pyarrow')
+                    print(f"   ✅ Loaded from cache: {cache_path} ({len(df):,} rows)")
+                    return df
+                except Exception as e:
+                    print(f"   ⚠️  Ignoring unreadable cache {cache_path}: {e}")
+            
+            df = loader()
+            if PARQUET_AVAILABLE and df is not None:
+                try:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    df.to_parquet(cache_path, engine='pyarrow', compression='zstd')
+                except Exception as e:
+                    print(f"   ⚠️  Could not write cache {cache_path}: {e}")
+            return df
+        
+        return wrapper
+    return decorator
+
+
+def read_budget_excel(path: str) -> pd.DataFrame:
+    """Read only the SOURCE_COLUMN_KEYWORDS columns of a budget file, as strings."""
+    header = column_index(pd.read_excel(path, engine=EXCEL_READER_ENGINE, nrows=0).columns)
+    matched = (find_column(header, keywords) for keywords in SOURCE_COLUMN_KEYWORDS)
+    usecols = list(dict.fromkeys(col for col in matched if col is not None))
+    return pd.read_excel(path, engine=EXCEL_READER_ENGINE, usecols=usecols, dtype=str, na_filter=False)
+
+
+@cache_parquet(EXPENSE_BUDGET_FILE)
 def load_expense_budget() -> Optional[pd.DataFrame]:
     """Load expense budget Excel file - Process ALL rows."""
     if not os.path.exists(EXPENSE_BUDGET_FILE):
@@ -376,7 +563,7 @@ def load_expense_budget() -> Optional[pd.DataFrame]:
         return None
     
     try:
-        df = pd.read_excel(EXPENSE_BUDGET_FILE, engine='openpyxl')
+        df = read_budget_excel(EXPENSE_BUDGET_FILE)
         print(f"   ✅ Loaded: {EXPENSE_BUDGET_FILE} ({len(df):,} rows)")
         return df
     except Exception as e:
@@ -384,6 +571,7 @@ def load_expense_budget() -> Optional[pd.DataFrame]:
         return None
 
 
+@cache_parquet(CAPITAL_BUDGET_FILE)
 def load_capital_budget() -> Optional[pd.DataFrame]:
     """Load capital budget Excel file - Filter to 'مستمر' rows only."""
     if not os.path.exists(CAPITAL_BUDGET_FILE):
@@ -391,13 +579,13 @@ def load_capital_budget() -> Optional[pd.DataFrame]:
         return None
     
     try:
-        df = pd.read_excel(CAPITAL_BUDGET_FILE, engine='openpyxl')
+        df = read_budget_excel(CAPITAL_BUDGET_FILE)
         print(f"   ✅ Loaded: {CAPITAL_BUDGET_FILE} ({len(df):,} total rows)")
         
         # Filter to continuous rows only (نوع ردیف = مستمر)
-        row_type_col = find_column(df, ['نوع ردیف'])
+        row_type_col = find_column(column_index(df.columns), ['نوع ردیف'])
         if row_type_col:
-            df_filtered = df[df[row_type_col].astype(str).str.contains('مستمر', na=False)]
+            df_filtered = df[df[row_type_col].str.contains('مستمر', regex=False)]
             print(f"   🔄 Filtered to 'مستمر' rows: {len(df_filtered):,} rows")
             return df_filtered
         else:
@@ -408,17 +596,18 @@ def load_capital_budget() -> Optional[pd.DataFrame]:
         return None
 
 
-def process_dataframe(df: pd.DataFrame, is_capital: bool) -> Dict[str, Set[str]]:
+def process_dataframe(df: pd.DataFrame, is_capital: bool) -> Dict[str, List[int]]:
     """
     Process DataFrame and extract CLEAN activities per subsystem.
     Uses CLEANING_MAP to avoid garbage titles.
-    Uses deduplication via Set.
+    Returns the unique TITLE_VOCAB codes of each subsystem's titles, sorted.
     """
     
     # Find relevant columns
-    desc_col = find_column(df, ['شرح ردیف', 'شرح'])
-    trustee_col = find_column(df, ['متولی', 'متولي'])
-    subject_col = find_column(df, ['موضوع'])
+    col_index = column_index(df.columns)
+    desc_col = find_column(col_index, ['شرح ردیف', 'شرح'])
+    trustee_col = find_column(col_index, ['متولی', 'متولي'])
+    subject_col = find_column(col_index, ['موضوع'])
     
     if not desc_col:
         print(f"   ⚠️  No description column found!")
@@ -426,44 +615,79 @@ def process_dataframe(df: pd.DataFrame, is_capital: bool) -> Dict[str, Set[str]]
     
     print(f"   📊 Found columns: desc={desc_col}, trustee={trustee_col}, subject={subject_col}")
     
-    # Use sets for deduplication per subsystem
-    subsystem_activities: Dict[str, Set[str]] = defaultdict(set)
+    rows = pd.DataFrame({
+        'description': clean_column(df, desc_col),
+        'trustee': clean_column(df, trustee_col),
+        'subject': clean_column(df, subject_col),
+    })
+    rows = rows[rows['description'] != ""]
+    
+    # Classification only depends on these three values, so each distinct
+    # combination is processed once; row_counts keeps the per-row statistics
+    row_counts = rows.groupby(list(rows.columns), sort=False).size()
+    unique_rows = row_counts.index.to_frame(index=False)
+    row_counts = row_counts.to_numpy()
+    description = unique_rows['description']
+    trustee = unique_rows['trustee']
+    subject = unique_rows['subject']
+    
+    # Description keywords for both maps: one automaton pass per distinct
+    # description, or one regex scan per map entry without pyahocorasick
+    if KEYWORD_AUTOMATON is not None:
+        hits = scan_column(description)
+        desc_subsystems = hits["subsystem" if is_capital else "expense_subsystem"]
+        desc_conditions = [desc_subsystems.notna().to_numpy()]
+        desc_choices = [desc_subsystems.to_numpy()]
+        clean_titles = hits["title"].to_numpy()
+        matched = hits["title"].notna().to_numpy()
+    else:
+        desc_conditions, desc_choices = [], []
+        for subsystem, pattern in DESCRIPTION_RULES[is_capital]:
+            desc_conditions.append(description.str.contains(pattern))
+            desc_choices.append(subsystem)
+        # (entries x rows) match matrix; argmax gives the first matching
+        # CLEANING_MAP entry, any() tells rows with no match apart
+        title_matrix = np.stack([
+            description.str.contains(pattern).to_numpy(dtype=bool)
+            for pattern in CLEANING_PATTERNS.values()
+        ])
+        matched = title_matrix.any(axis=0)
+        clean_titles = CLEANING_TITLES[title_matrix.argmax(axis=0)]
+    
+    # Step 1: Classify to subsystem (same waterfall as classify_row_to_subsystem;
+    # np.select picks the first condition that holds)
+    conditions, choices = [], []
+    for subsystem, pattern in TRUSTEE_RULES:
+        conditions.append(trustee.str.contains(pattern))
+        choices.append(subsystem)
+    conditions.append(subject.str.contains(KEYWORD_PATTERNS["PAYROLL"]))
+    choices.append("PAYROLL")
+    conditions += desc_conditions
+    choices += desc_choices
+    subsystems = np.select(conditions, choices, default="CONTRACTS" if is_capital else "OTHER")
+    
+    # Step 2: Clean title from CLEANING_MAP
+    # CRITICAL FALLBACK: No keyword matched -> Use generic fallback
+    # DO NOT use raw text (avoids garbage data)
+    fallback_titles = pd.Series(subsystems).map(FALLBACK_TITLES).to_numpy()
+    titles = np.where(matched, clean_titles, fallback_titles)
     
-    # Track statistics
     stats = {
-        'total_rows': 0,
-        'clean_matches': 0,
-        'fallback_used': 0
+        'total_rows': int(row_counts.sum()),
+        'clean_matches': int(row_counts[matched].sum()),
+        'fallback_used': int(row_counts[~matched].sum())
     }
     
-    for _, row in df.iterrows():
-        row_data = {
-            'description': clean_text(row.get(desc_col, '')),
-            'trustee': clean_text(row.get(trustee_col, '')) if trustee_col else '',
-            'subject': clean_text(row.get(subject_col, '')) if subject_col else ''
-        }
-        
-        if not row_data['description']:
-            continue
-        
-        stats['total_rows'] += 1
-        
-        # Step 1: Classify to subsystem
-        subsystem = classify_row_to_subsystem(row_data, is_capital)
-        
-        # Step 2: Get clean title using CLEANING_MAP
-        clean_title = get_clean_title(row_data['description'])
-        
-        if clean_title:
-            # Matched a keyword -> Use the dictionary key as title
-            stats['clean_matches'] += 1
-            subsystem_activities[subsystem].add(clean_title)
-        else:
-            # CRITICAL FALLBACK: No keyword matched -> Use generic fallback
-            # DO NOT use raw text (avoids garbage data)
-            stats['fallback_used'] += 1
-            fallback_title = get_fallback_title(subsystem)
-            subsystem_activities[subsystem].add(fallback_title)
+    # Deduplicate title codes per subsystem, sorted for build_subsystem_json
+    title_codes = pd.Categorical(titles, categories=TITLE_VOCAB).codes
+    subsystem_activities = (
+        pd.DataFrame({'sub': subsystems, 'title': title_codes})
+        .drop_duplicates()
+        .sort_values('title')
+        .groupby('sub', sort=False)['title']
+        .agg(list)
+        .to_dict()
+    )
     
     # Print statistics
     print(f"   📈 Processed: {stats['total_rows']} rows")
@@ -506,28 +730,31 @@ def build_activity_json(subsystem_code: str, title: str, index: int, budget_type
 
 
 def build_subsystem_json(subsystem_code: str, 
-                          expense_activities: Set[str], 
-                          capital_activities: Set[str]) -> dict:
-    """Build a single subsystem JSON object with merged activities."""
+                          expense_activities: List[int], 
+                          capital_activities: List[int]) -> dict:
+    """
+    Build a single subsystem JSON object with merged activities.
+    Activities are sorted TITLE_VOCAB codes, as returned by process_dataframe.
+    """
     
     subsystem_def = SUBSYSTEMS.get(subsystem_code, SUBSYSTEMS["OTHER"])
     
     activities = []
-    seen_titles = set()
+    seen_codes = set()
     activity_index = 1
     
     # Add expense activities first
-    for title in sorted(expense_activities):
-        if title not in seen_titles:
-            activities.append(build_activity_json(subsystem_code, title, activity_index, "expense"))
-            seen_titles.add(title)
+    for code in expense_activities:
+        if code not in seen_codes:
+            activities.append(build_activity_json(subsystem_code, TITLE_VOCAB[code], activity_index, "expense"))
+            seen_codes.add(code)
             activity_index += 1
     
     # Add capital activities
-    for title in sorted(capital_activities):
-        if title not in seen_titles:
-            activities.append(build_activity_json(subsystem_code, title, activity_index, "capital"))
-            seen_titles.add(title)
+    for code in capital_activities:
+        if code not in seen_codes:
+            activities.append(build_activity_json(subsystem_code, TITLE_VOCAB[code], activity_index, "capital"))
+            seen_codes.add(code)
             activity_index += 1
     
     return {
@@ -552,7 +779,7 @@ def generate_master_config() -> dict:
     print("  • Strict 13 Subsystems (no grouping)")
     print("  • Dictionary-based title cleaning (CLEANING_MAP)")
     print("  • Fallback titles to avoid garbage data")
-    print("  • Deduplication via Sets")
+    print("  • Deduplication via title codes")
     print()
     
     # Load data
@@ -576,9 +803,9 @@ def generate_master_config() -> dict:
     print(f"{'Subsystem':<40} | {'Expense':>8} | {'Capital':>8}")
     print("-" * 60)
     
-    for subsystem_code in sorted(SUBSYSTEMS.keys(), key=lambda x: SUBSYSTEMS[x]["order"]):
-        expense_count = len(expense_activities.get(subsystem_code, set()))
-        capital_count = len(capital_activities.get(subsystem_code, set()))
+    for subsystem_code in SUBSYSTEM_ORDER:
+        expense_count = len(expense_activities.get(subsystem_code, ()))
+        capital_count = len(capital_activities.get(subsystem_code, ()))
         if expense_count > 0 or capital_count > 0:
             title = SUBSYSTEMS[subsystem_code]['title']
             print(f"{title:<40} | {expense_count:>8} | {capital_count:>8}")
@@ -589,9 +816,9 @@ def generate_master_config() -> dict:
     print("🔨 Building JSON structure...")
     subsystems_json = []
     
-    for subsystem_code in sorted(SUBSYSTEMS.keys(), key=lambda x: SUBSYSTEMS[x]["order"]):
-        expense_acts = expense_activities.get(subsystem_code, set())
-        capital_acts = capital_activities.get(subsystem_code, set())
+    for subsystem_code in SUBSYSTEM_ORDER:
+        expense_acts = expense_activities.get(subsystem_code, [])
+        capital_acts = capital_activities.get(subsystem_code, [])
         
         # Only include subsystems with activities
         if expense_acts or capital_acts:
@@ -616,8 +843,12 @@ def save_config(config: dict):
     # Ensure directory exists
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    if ORJSON_AVAILABLE:
+        with open(OUTPUT_FILE, 'wb') as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
     
     print(f"\n✅ Saved to: {OUTPUT_FILE}")
     print(f"   Total subsystems: {len(config['subsystems'])}")
@@ -21,6 +21,12 @@ from collections import defaultdict, Counter
 from typing import Optional, List, Dict, Set, Tuple
 from datetime import datetime
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 
 # ============================================================
 # CONFIGURATION
@@ -302,10 +308,38 @@ def get_fallback_title(subsystem_code: str) -> str:
 # LAYER 1: DICTIONARY MATCHING
 # ============================================================
 
+def _build_cleaning_automaton():
+    """
+    Aho-Corasick automaton over every CLEANING_MAP keyword.
+    Each keyword maps to (priority, clean_title) of its first entry, so the
+    lowest priority found in a description is the title the loop would pick.
+    """
+    automaton = ahocorasick.Automaton()
+    for priority, (clean_title, keywords) in enumerate(CLEANING_MAP.items()):
+        for kw in keywords:
+            if kw not in automaton:
+                automaton.add_word(kw, (priority, clean_title))
+    automaton.make_automaton()
+    return automaton
+
+
+CLEANING_AUTOMATON = _build_cleaning_automaton() if AHOCORASICK_AVAILABLE else None
+
+# Without pyahocorasick: one literal alternation regex per CLEANING_MAP entry
+CLEANING_PATTERNS = [
+    (clean_title, re.compile("|".join(map(re.escape, keywords))))
+    for clean_title, keywords in CLEANING_MAP.items()
+]
+
+
 def match_dictionary(description: str) -> Optional[str]:
     """Layer 1: Check if description matches any keyword in CLEANING_MAP."""
-    for clean_title, keywords in CLEANING_MAP.items():
-        if contains_any(description, keywords):
+    if CLEANING_AUTOMATON is not None:
+        # All keywords found in a single pass over the description
+        hits = [value for _, value in CLEANING_AUTOMATON.iter(description)]
+        return min(hits)[1] if hits else None
+    for clean_title, pattern in CLEANING_PATTERNS:
+        if pattern.search(description):
             return clean_title
     return None
 
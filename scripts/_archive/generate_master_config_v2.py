@@ -326,11 +326,18 @@ def process_dataframe(df: pd.DataFrame, is_capital: bool) -> Dict[str, List[dict
     # Group activities by subsystem
     subsystem_activities = defaultdict(Counter)
     
-    for _, row in df.iterrows():
+    # Only the three used columns, iterated as plain tuples
+    columns = pd.DataFrame({
+        'description': df[desc_col],
+        'trustee': df[trustee_col] if trustee_col else '',
+        'subject': df[subject_col] if subject_col else ''
+    })
+    
+    for description, trustee, subject in columns.itertuples(index=False, name=None):
         row_data = {
-            'description': clean_text(row.get(desc_col, '')),
-            'trustee': clean_text(row.get(trustee_col, '')) if trustee_col else '',
-            'subject': clean_text(row.get(subject_col, '')) if subject_col else ''
+            'description': clean_text(description),
+            'trustee': clean_text(trustee),
+            'subject': clean_text(subject)
         }
         
         if not row_data['description']:
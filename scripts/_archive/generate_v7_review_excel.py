@@ -14,7 +14,7 @@ Usage:
 
 import pandas as pd
 import re
-from collections import defaultdict, Counter
+from collections import defaultdict
 from typing import Optional, List, Dict, Tuple
 from openpyxl import load_workbook
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
@@ -340,22 +340,24 @@ def load_excel(filepath: str, budget_type: str, filter_continuous: bool = False)
 def process_all_rows(all_rows: List[dict]) -> pd.DataFrame:
     """Process all rows through the V7 pipeline."""
     
-    # Group by unique description
-    desc_counter = Counter([r['description'] for r in all_rows])
-    
-    # Build lookup for budget type and subsystem
+    # One pass: count each unique description and take its budget type
+    # and subsystem from the first row it appears in
+    desc_counter = {}
     desc_to_info = {}
     for row in all_rows:
         desc = row['description']
-        if desc not in desc_to_info:
-            is_capital = row['budget_type'] == 'capital'
-            subsystem = classify_to_subsystem(
-                row['trustee'], row['subject'], desc, is_capital
-            )
-            desc_to_info[desc] = {
-                'subsystem': subsystem,
-                'budget_type': row['budget_type']
-            }
+        if desc in desc_counter:
+            desc_counter[desc] += 1
+            continue
+        desc_counter[desc] = 1
+        is_capital = row['budget_type'] == 'capital'
+        subsystem = classify_to_subsystem(
+            row['trustee'], row['subject'], desc, is_capital
+        )
+        desc_to_info[desc] = {
+            'subsystem': subsystem,
+            'budget_type': row['budget_type']
+        }
     
     # Layer 1: Dictionary matching
     dict_matched = {}
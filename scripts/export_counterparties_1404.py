@@ -13,11 +13,14 @@ from __future__ import annotations
 
 import json
 import os
+import pickle
 import re
 import shutil
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -30,6 +33,18 @@ except ImportError:
     from difflib import SequenceMatcher
     RAPIDFUZZ_AVAILABLE = False
 
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITER_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_WRITER_ENGINE = "openpyxl"
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -37,6 +52,11 @@ except ImportError:
 SOURCE_EXCEL_PATH = Path(r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\اطلاعات حسابداری1404.xlsx")
 OUTPUT_EXCEL_PATH = Path(r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\Clean_Counterparties_1404.xlsx")
 
+# Derived fields of previously seen (name, count) pairs are reused across runs.
+# Bump the version whenever normalization or classification rules change.
+DERIVED_CACHE_PATH = OUTPUT_EXCEL_PATH.with_suffix(".derived_cache.pkl")
+DERIVED_CACHE_VERSION = 2
+
 # Column mappings for this file
 TAFSILI_COL = "شرح سرفصل حساب تفضیلی"  # Person/Company names
 JOZV_COL = "شرح سرفصل حساب جزء"        # Contract/Project
@@ -44,6 +64,10 @@ KOL_NAME_COL = "TitkNam"                # سرفصل کل name
 KOL_NO_COL = "TitkNo"                   # سرفصل کل number
 MOEIN_COL = "شرح سرفصل حساب معین"       # معین
 
+# Only these columns are read from the source workbook
+SOURCE_COLUMNS = [TAFSILI_COL, JOZV_COL, KOL_NAME_COL, KOL_NO_COL, MOEIN_COL]
+SOURCE_DTYPES = {TAFSILI_COL: str, JOZV_COL: str, KOL_NAME_COL: str, MOEIN_COL: str}
+
 # Thresholds
 AUTO_MERGE_THRESHOLD = 0.97
 REVIEW_LOW_THRESHOLD = 0.90
@@ -51,34 +75,38 @@ MAX_BLOCK_ITEMS = 250
 MAX_TOTAL_FUZZY_COMPARISONS = 200_000
 TOKEN_FREQUENCY_THRESHOLD = 0.02
 
+# Derived-field computation is spread over worker processes above this size
+PARALLEL_MIN_NAMES = 5_000
+PARALLEL_CHUNK_SIZE = 2_000
+
 # =============================================================================
 # TOKEN LISTS
 # =============================================================================
 
-LEGAL_TOKENS = {
+LEGAL_TOKENS = frozenset({
     "شرکت", "شركت", "موسسه", "مؤسسه", "سهامی", "سهامي",
     "تعاونی", "تعاوني", "هلدینگ", "هلدينگ", "گروه",
     "پیمانکاری", "پيمانكاري", "تولیدی", "توليدي",
     "خدماتی", "خدماتي", "بازرگانی", "بازرگاني",
     "صنایع", "صنايع", "صنعتی", "صنعتي",
-}
+})
 
-PERSON_TITLES = {
+PERSON_TITLES = frozenset({
     "آقای", "آقاي", "اقای", "اقاي", "آقا",
     "خانم", "خانوم", "دکتر", "دكتر",
     "مهندس", "حاج", "حاجی", "حاجي",
     "سید", "سيد", "سیده", "سيده",
-}
+})
 
-GENERIC_ORG_WORDS = {"سازمان", "اداره", "مدیریت", "مديريت", "معاونت", "واحد"}
+GENERIC_ORG_WORDS = frozenset({"سازمان", "اداره", "مدیریت", "مديريت", "معاونت", "واحد"})
 
-PROTECT_TOKENS = {
+PROTECT_TOKENS = frozenset({
     "بانک", "بانك", "بیمه", "بيمه",
     "شهرداری", "شهرداري", "دانشگاه",
     "بیمارستان", "بيمارستان", "صندوق",
-}
+})
 
-ACCOUNTING_TOKENS = {
+ACCOUNTING_TOKENS = frozenset({
     "هزینه", "هزينه", "درآمد", "مخارج", "حقوق", "دستمزد",
     "تنخواه", "جاری", "جاري", "متفرقه",
     "بستانکار", "بستانكار", "بدهکار", "بدهكار",
@@ -87,16 +115,24 @@ ACCOUNTING_TOKENS = {
     "استهلاک", "استهلاك", "پیش پرداخت", "پيش پرداخت",
     "دریافتنی", "دريافتني", "پرداختنی", "پرداختني",
     "فروش", "خرید", "خريد", "مالیات", "ماليات", "عوارض",
-}
+})
+
+NOISE_TOKENS = frozenset({"و", "یا", "يا", "با", "در", "از", "به", "تا"})
 
-NOISE_TOKENS = {"و", "یا", "يا", "با", "در", "از", "به", "تا"}
+# Precomputed unions used on hot paths
+_REMOVABLE = LEGAL_TOKENS | GENERIC_ORG_WORDS | PERSON_TITLES
+_LEGAL_OR_PROTECT = LEGAL_TOKENS | PROTECT_TOKENS
 
-HARD_DELETE_PATTERNS = [
-    re.compile(r"^\d+$"),
-    re.compile(r"^(سال|ماه)\s*\d{2,4}$"),
-    re.compile(r"^\d{4}$"),
-    re.compile(r"^(پروژه|احداث|ساخت|تکمیل|بازسازی)\b", re.UNICODE),
-]
+# Single alternation; the group name that matched is the delete reason.
+HARD_DELETE_RE = re.compile(
+    r"^(?:"
+    r"(?P<numeric>\d+$)"
+    r"|(?P<year_month>(?:سال|ماه)\s*\d{2,4}$)"
+    r"|(?P<year>\d{4}$)"
+    r"|(?P<project>(?:پروژه|احداث|ساخت|تکمیل|بازسازی)\b)"
+    r")",
+    re.UNICODE,
+)
 
 # =============================================================================
 # NORMALIZATION
@@ -156,8 +192,7 @@ def compute_base_name(name: str) -> str:
     if has_protect:
         cleaned = [t for t in tokens if t not in PERSON_TITLES]
     else:
-        removable = LEGAL_TOKENS | PERSON_TITLES | GENERIC_ORG_WORDS
-        cleaned = [t for t in tokens if t not in removable]
+        cleaned = [t for t in tokens if t not in _REMOVABLE]
     return " ".join(cleaned) if cleaned else " ".join(tokens)
 
 
@@ -168,7 +203,7 @@ def compute_base_compact(base_name: str) -> str:
 def is_significant_token(token: str, freq_ratio: float) -> bool:
     if len(token) < 3:
         return False
-    if token in LEGAL_TOKENS | GENERIC_ORG_WORDS | PERSON_TITLES:
+    if token in _REMOVABLE:
         return False
     if token.isdigit():
         return False
@@ -177,15 +212,24 @@ def is_significant_token(token: str, freq_ratio: float) -> bool:
     return True
 
 
+@lru_cache(maxsize=None)
+def significant_candidates(text: str) -> tuple[str, ...]:
+    """Tokens that pass every frequency-independent check of is_significant_token."""
+    return tuple(
+        t for t in tokenize(text)
+        if len(t) >= 3 and not t.isdigit() and t not in _REMOVABLE
+    )
+
+
 # =============================================================================
 # HARD DELETE CHECK
 # =============================================================================
 
 def should_hard_delete(name: str) -> tuple[bool, str]:
     norm = normalize_canonical(name)
-    for pattern in HARD_DELETE_PATTERNS:
-        if pattern.match(norm):
-            return True, f"pattern:{pattern.pattern}"
+    m = HARD_DELETE_RE.match(norm)
+    if m:
+        return True, f"pattern:{m.lastgroup}"
     return False, ""
 
 
@@ -244,7 +288,7 @@ def classify_non_counterparty(score: int) -> str:
 
 def classify_entity_type(name: str) -> tuple[str, str, str]:
     tokens = set(tokenize(name))
-    if tokens & LEGAL_TOKENS or tokens & PROTECT_TOKENS:
+    if tokens & _LEGAL_OR_PROTECT:
         return "COMPANY", "HIGH", "legal_or_protect_token"
     if tokens & PERSON_TITLES:
         return "PERSON", "HIGH", "person_title"
@@ -256,6 +300,41 @@ def classify_entity_type(name: str) -> tuple[str, str, str]:
     return "UNKNOWN", "LOW", "no_signals"
 
 
+# =============================================================================
+# DERIVED FIELDS
+# =============================================================================
+
+def compute_derived_fields(args: tuple[str, int]) -> tuple:
+    """Pure per-name classification; top-level so worker processes can pickle it."""
+    name, count = args
+    base_name = compute_base_name(name)
+    base_compact = compute_base_compact(base_name)
+    etype, econf, ereason = classify_entity_type(name)
+    score, reasons = compute_non_counterparty_score(name, base_compact, count)
+    has_legal = not LEGAL_TOKENS.isdisjoint(tokenize(name))
+    return (
+        base_name, base_compact, etype, econf, ereason,
+        score, reasons, classify_non_counterparty(score), has_legal,
+    )
+
+
+def load_derived_cache() -> dict:
+    try:
+        with open(DERIVED_CACHE_PATH, "rb") as f:
+            version, cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return {}
+    return cache if version == DERIVED_CACHE_VERSION else {}
+
+
+def save_derived_cache(cache: dict) -> None:
+    try:
+        with open(DERIVED_CACHE_PATH, "wb") as f:
+            pickle.dump((DERIVED_CACHE_VERSION, cache), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        print(f"      WARNING: could not write derived cache: {e}")
+
+
 # =============================================================================
 # UNION-FIND
 # =============================================================================
@@ -293,6 +372,25 @@ class UnionFind:
             self.rank[ra] += 1
         return True
     
+    def union_many(self, items: list[str], method: str) -> int:
+        """Attach every item's root to the first item's root; returns merges made."""
+        if not items:
+            return 0
+        root = self.find(items[0])
+        methods = self.methods[root]
+        methods.add(method)
+        merged = 0
+        for x in items[1:]:
+            r = self.find(x)
+            if r == root:
+                continue
+            self.parent[r] = root
+            if self.rank[r] >= self.rank[root]:
+                self.rank[root] = self.rank[r] + 1
+            methods.update(self.methods.pop(r, ()))
+            merged += 1
+        return merged
+    
     def get_methods(self, x: str) -> set[str]:
         return self.methods.get(self.find(x), set())
 
@@ -330,6 +428,7 @@ class NameStats:
     non_cp_score: int = 0
     non_cp_reasons: list = field(default_factory=list)
     counterparty_flag: str = "COUNTERPARTY"
+    has_legal: bool = False  # any LEGAL_TOKENS among the name's tokens
 
 
 # =============================================================================
@@ -352,14 +451,19 @@ def main():
     print("\n[1/6] Loading source Excel...")
     print(f"      Path: {SOURCE_EXCEL_PATH}")
     
-    df = pd.read_excel(SOURCE_EXCEL_PATH)
-    print(f"      Rows: {len(df):,}")
-    print(f"      Columns: {list(df.columns)[:8]}...")
-    
-    # Verify columns exist
-    if TAFSILI_COL not in df.columns:
-        print(f"ERROR: Column '{TAFSILI_COL}' not found!")
+    try:
+        df = pd.read_excel(
+            SOURCE_EXCEL_PATH,
+            engine=EXCEL_READER_ENGINE,
+            usecols=SOURCE_COLUMNS,
+            dtype=SOURCE_DTYPES,
+        )
+    except ValueError as e:
+        # usecols raises when a required column is missing
+        print(f"ERROR: {e}")
         return
+    print(f"      Rows: {len(df):,}")
+    print(f"      Engine: {EXCEL_READER_ENGINE}")
     
     print(f"      Tafsili: {TAFSILI_COL}")
     print(f"      Kol Name: {KOL_NAME_COL}")
@@ -373,12 +477,22 @@ def main():
     name_stats: dict[str, NameStats] = {}
     hard_deleted: list[tuple[str, str]] = []
     
-    for _, row in df.iterrows():
-        raw = row.get(TAFSILI_COL)
-        if pd.isna(raw) or not str(raw).strip():
+    # Clean the collected columns once, column-wise, instead of per row
+    raw_col = df[TAFSILI_COL].str.strip()
+    kol_name_col = df[KOL_NAME_COL].str.strip()
+    kol_no_col = df[KOL_NO_COL].dropna().astype("int64").astype(str).reindex(df.index)
+    moein_col = df[MOEIN_COL].str.strip()
+    jozv_col = df[JOZV_COL].str.strip()
+    # Skip very short values, truncate long ones
+    jozv_col = jozv_col.where(jozv_col.str.len() > 3).str.slice(0, 100)
+    
+    for raw, kol_name, kol_no, moein, jozv in zip(
+        raw_col, kol_name_col, kol_no_col, moein_col, jozv_col
+    ):
+        if pd.isna(raw) or not raw:
             continue
         
-        norm = normalize_canonical(str(raw))
+        norm = normalize_canonical(raw)
         if not norm:
             continue
         
@@ -392,42 +506,52 @@ def main():
             name_stats[norm] = NameStats()
         
         stats = name_stats[norm]
-        stats.originals.add(str(raw).strip())
+        stats.originals.add(raw)
         stats.count += 1
         
         # Collect سرفصل کل
-        if KOL_NAME_COL in df.columns and pd.notna(row.get(KOL_NAME_COL)):
-            stats.kol_names.add(str(row.get(KOL_NAME_COL)).strip())
-        if KOL_NO_COL in df.columns and pd.notna(row.get(KOL_NO_COL)):
-            stats.kol_numbers.add(str(int(row.get(KOL_NO_COL))))
+        if pd.notna(kol_name):
+            stats.kol_names.add(kol_name)
+        if pd.notna(kol_no):
+            stats.kol_numbers.add(kol_no)
         
         # Collect معین
-        if MOEIN_COL in df.columns and pd.notna(row.get(MOEIN_COL)):
-            stats.moein_values.add(str(row.get(MOEIN_COL)).strip())
+        if pd.notna(moein):
+            stats.moein_values.add(moein)
         
         # Collect جزء (contracts)
-        if JOZV_COL in df.columns and pd.notna(row.get(JOZV_COL)):
-            jozv = str(row.get(JOZV_COL)).strip()
-            if len(jozv) > 3:  # Skip very short values
-                stats.jozv_values.add(jozv[:100])  # Truncate long values
+        if pd.notna(jozv):
+            stats.jozv_values.add(jozv)
     
     all_names = list(name_stats.keys())
     print(f"      Unique names: {len(all_names):,}")
     print(f"      Hard deleted: {len(hard_deleted)}")
     
     # Compute derived fields
-    for name in all_names:
+    inputs = [(name, name_stats[name].count) for name in all_names]
+    cached = load_derived_cache()
+    pending = [x for x in inputs if x not in cached]
+    print(f"      Derived fields cached: {len(inputs) - len(pending):,}, computing: {len(pending):,}")
+    if len(pending) >= PARALLEL_MIN_NAMES:
+        with ProcessPoolExecutor() as pool:
+            computed = list(pool.map(compute_derived_fields, pending, chunksize=PARALLEL_CHUNK_SIZE))
+    else:
+        computed = [compute_derived_fields(x) for x in pending]
+    cached.update(zip(pending, computed))
+    derived_cache = {x: cached[x] for x in inputs}
+    if pending or len(derived_cache) != len(cached):
+        save_derived_cache(derived_cache)
+    
+    for name, key in zip(all_names, inputs):
+        fields = derived_cache[key]
         stats = name_stats[name]
-        stats.base_name = compute_base_name(name)
-        stats.base_compact = compute_base_compact(stats.base_name)
-        etype, econf, ereason = classify_entity_type(name)
-        stats.entity_type = etype
-        stats.entity_confidence = econf
-        stats.entity_reason = ereason
-        score, reasons = compute_non_counterparty_score(name, stats.base_compact, stats.count)
-        stats.non_cp_score = score
-        stats.non_cp_reasons = reasons
-        stats.counterparty_flag = classify_non_counterparty(score)
+        (
+            stats.base_name, stats.base_compact,
+            stats.entity_type, stats.entity_confidence, stats.entity_reason,
+            stats.non_cp_score, stats.non_cp_reasons, stats.counterparty_flag,
+            stats.has_legal,
+        ) = fields
+        stats.non_cp_reasons = list(stats.non_cp_reasons)
     
     # -------------------------------------------------------------------------
     # STEP 3: Build Clusters
@@ -449,10 +573,7 @@ def main():
             continue
         if len(base.split()) == 1 and len(base) <= 3:
             continue
-        first = names[0]
-        for other in names[1:]:
-            if dsu.union(first, other, "base"):
-                merge_count_base += 1
+        merge_count_base += dsu.union_many(names, "base")
     print(f"      Stage 1 (base): {merge_count_base}")
     
     # Stage 2: Fuzzy matching with blocking
@@ -465,14 +586,13 @@ def main():
             token_counts[tok] += 1
     n_names = len(all_names)
     
+    max_token_count = TOKEN_FREQUENCY_THRESHOLD * n_names
     significant_tokens = {}
     for name in all_names:
-        sig_toks = []
-        for tok in tokenize(name):
-            freq_ratio = token_counts[tok] / n_names if n_names > 0 else 0
-            if is_significant_token(tok, freq_ratio):
-                sig_toks.append(tok)
-        significant_tokens[name] = sig_toks
+        significant_tokens[name] = [
+            tok for tok in significant_candidates(name)
+            if token_counts[tok] <= max_token_count
+        ]
     
     blocks = defaultdict(list)
     for name in all_names:
@@ -543,9 +663,22 @@ def main():
     # -------------------------------------------------------------------------
     print("\n[4/6] Building final results...")
     
+    roots = [dsu.find(name) for name in all_names]
     clusters = defaultdict(list)
-    for name in all_names:
-        clusters[dsu.find(name)].append(name)
+    for name, root in zip(all_names, roots):
+        clusters[root].append(name)
+    
+    # Numeric per-cluster aggregates in one groupby pass
+    cluster_summary = pd.DataFrame({
+        "root": roots,
+        "count": [name_stats[n].count for n in all_names],
+        "non_cp_score": [name_stats[n].non_cp_score for n in all_names],
+    }).groupby("root", sort=False).agg(
+        total_count=("count", "sum"),
+        max_ncp_score=("non_cp_score", "max"),
+    )
+    cluster_totals = cluster_summary["total_count"].to_dict()
+    cluster_max_ncp = cluster_summary["max_ncp_score"].to_dict()
     
     master_rows = []
     potential_noncp_rows = []
@@ -553,7 +686,7 @@ def main():
     
     for root, members in clusters.items():
         # Aggregate
-        total_count = sum(name_stats[m].count for m in members)
+        total_count = int(cluster_totals[root])
         all_originals = set().union(*(name_stats[m].originals for m in members))
         all_kol_names = set().union(*(name_stats[m].kol_names for m in members))
         all_kol_numbers = set().union(*(name_stats[m].kol_numbers for m in members))
@@ -581,14 +714,17 @@ def main():
         else:
             final_cp_flag = "COUNTERPARTY"
         
-        max_ncp_score = max(name_stats[m].non_cp_score for m in members)
-        
-        # Canonical selection
-        def canonical_score(m):
-            has_legal = bool(set(tokenize(m)) & LEGAL_TOKENS)
-            return (name_stats[m].count, 1 if has_legal else 0, len(m))
+        max_ncp_score = int(cluster_max_ncp[root])
         
-        canonical = max(members, key=canonical_score)
+        # Canonical selection: most frequent, then legal-token names, then longest
+        canonical = None
+        best_key = (-1, -1, -1)
+        for m in members:
+            s = name_stats[m]
+            key = (s.count, 1 if s.has_legal else 0, len(m))
+            if key > best_key:
+                best_key = key
+                canonical = m
         base = name_stats[canonical].base_name
         
         # Variants preview
@@ -691,7 +827,8 @@ def main():
     ]
     master_df = master_df[[c for c in column_order if c in master_df.columns]]
     
-    with pd.ExcelWriter(OUTPUT_EXCEL_PATH, engine="openpyxl") as writer:
+    # No styling is applied here, so the faster xlsxwriter engine is used when available
+    with pd.ExcelWriter(OUTPUT_EXCEL_PATH, engine=EXCEL_WRITER_ENGINE) as writer:
         master_df.to_excel(writer, sheet_name="Master", index=False)
         
         if fuzzy_review:
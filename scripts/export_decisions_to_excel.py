@@ -2,6 +2,12 @@ import json
 import pandas as pd
 import os
 
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 # Define paths
 json_path = r"C:\Users\Dour_Andish\.gemini\antigravity\brain\592da352-7d36-4150-8edd-0b906c5f22bb\entity_resolution_decisions.json"
 output_excel_path = r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\Entity_Resolution_Decisions.xlsx"
@@ -10,11 +16,13 @@ output_excel_path = r"f:\Freelancing_Project\KalaniProject\municipality_demo\dat
 os.makedirs(os.path.dirname(output_excel_path), exist_ok=True)
 
 try:
-    # Load JSON data
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    decisions = data.get('decisions', [])
+    # Load JSON data (streamed one decision at a time when ijson is available)
+    if IJSON_AVAILABLE:
+        with open(json_path, 'rb') as f:
+            decisions = list(ijson.items(f, 'decisions.item', use_float=True))
+    else:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            decisions = json.load(f).get('decisions', [])
 
     if not decisions:
         print("No decisions found in the JSON file.")
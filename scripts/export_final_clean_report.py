@@ -15,7 +15,7 @@ Usage:
 import json
 import pandas as pd
 from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 
 # ============================================================
@@ -122,6 +122,14 @@ def flatten_config(config: dict) -> list:
 # EXCEL FORMATTING
 # ============================================================
 
+def apply_named_style(cell, style_name: str):
+    """Assign a named style while keeping the cell's own number format."""
+    number_format = cell.number_format
+    cell.style = style_name
+    if number_format != cell.number_format:
+        cell.number_format = number_format
+
+
 def style_excel(output_path: str):
     """Apply professional RTL styling to the Excel file."""
     wb = load_workbook(output_path)
@@ -144,22 +152,32 @@ def style_excel(output_path: str):
     light_fill = PatternFill(start_color="D6DCE5", end_color="D6DCE5", fill_type="solid")
     white_fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
     
+    # Register each combination once as a named style so every cell shares
+    # a single style id instead of building its own style array
+    header_style = NamedStyle(
+        name="report_header", font=header_font, fill=header_fill,
+        alignment=header_alignment, border=thin_border
+    )
+    even_style = NamedStyle(
+        name="report_even", fill=light_fill,
+        alignment=cell_alignment, border=thin_border
+    )
+    odd_style = NamedStyle(
+        name="report_odd", fill=white_fill,
+        alignment=cell_alignment, border=thin_border
+    )
+    for style in (header_style, even_style, odd_style):
+        wb.add_named_style(style)
+    
     # Style header row
     for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
+        apply_named_style(cell, header_style.name)
     
     # Style data rows
     for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_row=ws.max_row), start=2):
+        style_name = even_style.name if row_idx % 2 == 0 else odd_style.name
         for cell in row:
-            cell.alignment = cell_alignment
-            cell.border = thin_border
-            if row_idx % 2 == 0:
-                cell.fill = light_fill
-            else:
-                cell.fill = white_fill
+            apply_named_style(cell, style_name)
     
     # Auto-adjust column widths
     column_widths = {
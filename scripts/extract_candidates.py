@@ -1,31 +1,129 @@
 """
 Extract candidate pairs for entity resolution with full accounting context.
 Output: JSON with pairs, their Kol/Moein profiles, Joze samples, and frequencies.
+
+Usage:
+    python scripts/extract_candidates.py [--input X.xlsx] [--output pairs.json]
+
+    # Split the pair search over N independent processes, then merge:
+    python scripts/extract_candidates.py --shard-idx 0 --shard-count 2 --output p0.json
+    python scripts/extract_candidates.py --shard-idx 1 --shard-count 2 --output p1.json
+    python scripts/extract_candidates.py --merge p0.json p1.json --output pairs.json
 """
+import argparse
+import numpy as np
 import pandas as pd
 import json
 import re
 import unicodedata
-from rapidfuzz import fuzz
-from collections import defaultdict
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+# Defaults; override with --input / --output
+INPUT_FILE = Path(r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\Uniqe Person_Company.xlsx")
+OUTPUT_FILE = Path(r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\candidate_pairs.json")
+
+# Candidates are similar but not identical: MIN_SIMILARITY <= fuzz.ratio < 100
+# (scored as Indel.normalized_similarity, which is fuzz.ratio / 100)
+MIN_SIMILARITY = 75
+# Rows of the similarity matrix scored per cdist call (bounds peak memory)
+CDIST_CHUNK_ROWS = 1000
+# Blocks scored concurrently; each holds a dense CDIST_CHUNK_ROWS-row matrix,
+# so peak memory grows with CDIST_WORKERS * CDIST_CHUNK_ROWS
+CDIST_WORKERS = 4
+# fuzz.ratio <= 200 * short / (short + long), so reaching MIN_SIMILARITY
+# requires short / long >= MIN_SIMILARITY / (200 - MIN_SIMILARITY)
+MIN_LENGTH_RATIO = MIN_SIMILARITY / (200 - MIN_SIMILARITY)
+# Names seen fewer times than this are only paired when they carry some
+# accounting context (a shenaseh or a Kol value); otherwise a match cannot
+# be reviewed meaningfully
+MIN_CANDIDATE_COUNT = 2
+# Highest-scoring pairs written to OUTPUT_FILE
+TOP_CANDIDATES = 50
 
-INPUT_FILE = r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\Uniqe Person_Company.xlsx"
-OUTPUT_FILE = r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\candidate_pairs.json"
+_NORMALIZE_TRANS = str.maketrans({'ي': 'ی', 'ك': 'ک', 'ة': 'ه', 'آ': 'ا', 'أ': 'ا', 'إ': 'ا'})
+_RE_PUNCT = re.compile(r'[^\w\s]')
+_RE_WS = re.compile(r'\s+')
 
 def normalize_text(text):
     if not isinstance(text, str):
         return ""
-    text = unicodedata.normalize('NFKC', text)
-    text = text.replace('ي', 'ی').replace('ك', 'ک').replace('ة', 'ه')
-    text = text.replace('آ', 'ا').replace('أ', 'ا').replace('إ', 'ا')
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    text = unicodedata.normalize('NFKC', text).translate(_NORMALIZE_TRANS)
+    return _RE_WS.sub(' ', _RE_PUNCT.sub(' ', text)).strip()
+
+def normalize_series(values):
+    """Column-wise normalize_text using pandas string kernels; non-strings become ''."""
+    return (
+        values.str.normalize('NFKC')
+        .str.translate(_NORMALIZE_TRANS)
+        .str.replace(_RE_PUNCT, ' ', regex=True)
+        .str.replace(_RE_WS, ' ', regex=True)
+        .str.strip()
+        .fillna('')
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract entity-resolution candidate pairs")
+    parser.add_argument('--input', type=Path, default=INPUT_FILE,
+                        help='Source Excel file')
+    parser.add_argument('--output', type=Path, default=OUTPUT_FILE,
+                        help='Candidate pairs JSON to write')
+    parser.add_argument('--min-count', type=int, default=MIN_CANDIDATE_COUNT,
+                        help='Occurrences needed for a name without shenaseh/Kol context')
+    parser.add_argument('--shard-idx', type=int, default=0,
+                        help='Which share of the pair search this process runs')
+    parser.add_argument('--shard-count', type=int, default=1,
+                        help='Number of processes the pair search is split across')
+    parser.add_argument('--merge', type=Path, nargs='+', metavar='SHARD_JSON',
+                        help='Combine shard outputs into --output instead of searching')
+    args = parser.parse_args()
+    if not 0 <= args.shard_idx < args.shard_count:
+        parser.error("--shard-idx must be in [0, --shard-count)")
+    return args
+
+def write_pairs(path, candidate_pairs):
+    output = {'candidate_pairs': candidate_pairs}
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+
+def merge_shards(shard_paths, output_path):
+    """Re-rank the pairs of several shard outputs and keep the overall top TOP_CANDIDATES."""
+    pairs = []
+    for path in shard_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            pairs.extend(json.load(f)['candidate_pairs'])
+    # Every pair is found by exactly one shard, so no dedup is needed
+    pairs.sort(key=lambda p: p['similarity_score'], reverse=True)
+    write_pairs(output_path, pairs[:TOP_CANDIDATES])
+    print(f"Merged {len(pairs)} pairs from {len(shard_paths)} shards into {output_path}")
 
 def main():
-    print("Loading data...")
-    df = pd.read_excel(INPUT_FILE)
+    args = parse_args()
+    if args.merge:
+        merge_shards(args.merge, args.output)
+        return
     
+    print("Loading data...")
     # Identify columns
     tafsili_col = 'تفضیلی'
     joze_col = 'جزء'
@@ -33,108 +131,144 @@ def main():
     moein_col = 'معین'
     shenaseh_col = 'شناسه'
     
+    # Only the profile columns are parsed, all as text
+    df = pd.read_excel(
+        args.input,
+        engine=EXCEL_READER_ENGINE,
+        usecols=[tafsili_col, joze_col, kol_col, moein_col, shenaseh_col],
+        dtype=str,
+    )
+    
     # Normalize names
-    df['normalized'] = df[tafsili_col].apply(normalize_text)
+    df['normalized'] = normalize_series(df[tafsili_col])
     
     # Build entity profiles: for each unique normalized name, collect context
-    entity_profiles = defaultdict(lambda: {
-        'original_names': set(),
-        'kol_values': [],
-        'moein_values': [],
-        'joze_samples': [],
-        'shenaseh_values': set(),
-        'count': 0
+    df = df[df['normalized'].str.len() >= 3]
+    grp = df.groupby('normalized', sort=False)
+    
+    def non_null_str(s):
+        return s.dropna().astype(str)
+    
+    def most_common(s):
+        values = non_null_str(s)
+        return Counter(values).most_common(1)[0][0] if len(values) else None
+    
+    # Columnar profiles (one row per normalized name) rather than a dict per entity.
+    # dict.fromkeys dedupes while keeping first-seen order
+    profiles = pd.DataFrame({
+        'original_names': grp[tafsili_col].agg(lambda s: list(dict.fromkeys(s.astype(str)))),
+        'top_kol': grp[kol_col].agg(most_common),
+        'top_moein': grp[moein_col].agg(most_common),
+        # First three distinct (truncated) contract samples, in row order
+        'joze_samples': grp[joze_col].agg(
+            lambda s: list(dict.fromkeys(non_null_str(s).str[:100]))[:3]
+        ),
+        'shenaseh_values': grp[shenaseh_col].agg(lambda s: list(dict.fromkeys(non_null_str(s)))),
+        'count': grp.size(),
     })
     
-    for _, row in df.iterrows():
-        norm = row['normalized']
-        if not norm or len(norm) < 3:
-            continue
-        
-        profile = entity_profiles[norm]
-        profile['original_names'].add(str(row[tafsili_col]))
-        profile['count'] += 1
-        
-        if pd.notna(row.get(kol_col)):
-            profile['kol_values'].append(str(row[kol_col]))
-        if pd.notna(row.get(moein_col)):
-            profile['moein_values'].append(str(row[moein_col]))
-        if pd.notna(row.get(joze_col)):
-            joze = str(row[joze_col])[:100]  # Truncate
-            if joze not in profile['joze_samples'] and len(profile['joze_samples']) < 3:
-                profile['joze_samples'].append(joze)
-        if pd.notna(row.get(shenaseh_col)):
-            profile['shenaseh_values'].add(str(row[shenaseh_col]))
-    
-    # Convert sets to lists for JSON
-    for k, v in entity_profiles.items():
-        v['original_names'] = list(v['original_names'])
-        v['shenaseh_values'] = list(v['shenaseh_values'])
-        # Get top Kol/Moein
-        v['top_kol'] = max(set(v['kol_values']), key=v['kol_values'].count) if v['kol_values'] else None
-        v['top_moein'] = max(set(v['moein_values']), key=v['moein_values'].count) if v['moein_values'] else None
-        del v['kol_values']
-        del v['moein_values']
+    # Drop low-information names before the pair search
+    informative = (
+        (profiles['count'] >= args.min_count)
+        | (profiles['shenaseh_values'].str.len() > 0)
+        | profiles['top_kol'].notna()
+    )
+    print(f"Skipping {int((~informative).sum())} names seen < {args.min_count} times without context")
+    profiles = profiles[informative]
     
     # Find candidate pairs (fuzzy similarity > 80 but < 100)
-    names = list(entity_profiles.keys())
+    # Sorted by length so each block only needs comparing against the names
+    # that are long enough yet not too long to reach MIN_SIMILARITY
+    profiles = profiles.iloc[np.argsort(profiles.index.str.len().to_numpy(), kind='stable')]
+    names = profiles.index.tolist()
+    lengths = [len(n) for n in names]
     print(f"Total unique normalized names: {len(names)}")
     
-    candidate_pairs = []
-    seen = set()
+    # Positional column access for pair assembly
+    originals = profiles['original_names'].tolist()
+    top_kol = profiles['top_kol'].tolist()
+    top_moein = profiles['top_moein'].tolist()
+    joze_samples = profiles['joze_samples'].tolist()
+    shenaseh = profiles['shenaseh_values'].tolist()
+    counts = profiles['count'].tolist()
     
-    for i, name_a in enumerate(names):
-        if i % 100 == 0:
-            print(f"Processing {i}/{len(names)}...")
+    def score_block(start):
+        """Upper-triangle hits of the block starting at start, as index arrays into names plus scores."""
+        stop = min(start + CDIST_CHUNK_ROWS, len(names))
+        # Longest name any query in this block can still match
+        limit = bisect_right(lengths, lengths[stop - 1] / MIN_LENGTH_RATIO)
         
-        for j, name_b in enumerate(names):
-            if i >= j:
-                continue
-            
-            # Skip if exactly equal (already grouped)
-            if name_a == name_b:
-                continue
-            
-            score = fuzz.ratio(name_a, name_b)
-            
-            # Candidates: similar but not identical
-            if 75 <= score < 100:
-                pair_key = tuple(sorted([name_a, name_b]))
-                if pair_key in seen:
-                    continue
-                seen.add(pair_key)
-                
-                profile_a = entity_profiles[name_a]
-                profile_b = entity_profiles[name_b]
-                
-                candidate_pairs.append({
-                    'a': name_a,
-                    'b': name_b,
-                    'similarity_score': score,
-                    'a_originals': profile_a['original_names'],
-                    'b_originals': profile_b['original_names'],
-                    'a_top_kol': profile_a['top_kol'],
-                    'b_top_kol': profile_b['top_kol'],
-                    'a_top_moein': profile_a['top_moein'],
-                    'b_top_moein': profile_b['top_moein'],
-                    'a_joze_samples': profile_a['joze_samples'],
-                    'b_joze_samples': profile_b['joze_samples'],
-                    'a_shenaseh': profile_a['shenaseh_values'],
-                    'b_shenaseh': profile_b['shenaseh_values'],
-                    'a_count': profile_a['count'],
-                    'b_count': profile_b['count']
-                })
-    
-    # Sort by similarity (highest first)
-    candidate_pairs.sort(key=lambda x: x['similarity_score'], reverse=True)
-    
-    print(f"Found {len(candidate_pairs)} candidate pairs")
+        # Scores below the cutoff come back as 0. Single-threaded here:
+        # blocks run concurrently in the pool (cdist releases the GIL).
+        # float64 keeps the scores identical to fuzz.ratio
+        scores = process.cdist(
+            names[start:stop], names[start:limit],
+            scorer=Indel.normalized_similarity, score_cutoff=MIN_SIMILARITY / 100,
+            dtype=np.float64, workers=1,
+        )
+        # Upper triangle only (j > i), and skip identical names
+        rows, cols = np.nonzero(scores)
+        vals = scores[rows, cols]
+        keep = (cols > rows) & (vals < 1.0)
+        return start, rows[keep] + start, cols[keep] + start, vals[keep] * 100
+    
+    hit_i, hit_j, hit_score = [], [], []
+    with ThreadPoolExecutor(max_workers=CDIST_WORKERS) as pool:
+        # Each shard scores every shard_count-th block against all names, so
+        # together the shards cover each pair exactly once
+        block_starts = range(
+            args.shard_idx * CDIST_CHUNK_ROWS, len(names), args.shard_count * CDIST_CHUNK_ROWS
+        )
+        blocks = pool.map(score_block, block_starts)
+        for start, block_rows, block_cols, block_vals in blocks:
+            print(f"Processing {start}/{len(names)}...")
+            hit_i.append(block_rows)
+            hit_j.append(block_cols)
+            hit_score.append(block_vals)
+    
+    hit_i = np.concatenate(hit_i) if hit_i else np.empty(0, dtype=np.intp)
+    hit_j = np.concatenate(hit_j) if hit_j else np.empty(0, dtype=np.intp)
+    hit_score = np.concatenate(hit_score) if hit_score else np.empty(0, dtype=np.float64)
+    print(f"Found {len(hit_score)} candidate pairs")
+    
+    # Top TOP_CANDIDATES by similarity (highest first) without sorting every hit.
+    # Pairs tied at the cutoff score are taken earliest-found first, so the
+    # result matches a stable sort of all hits
+    k = min(TOP_CANDIDATES, len(hit_score))
+    if k:
+        cutoff = -np.partition(-hit_score, k - 1)[k - 1]
+        above = np.flatnonzero(hit_score > cutoff)
+        tied = np.flatnonzero(hit_score == cutoff)[:k - len(above)]
+        top = np.concatenate((above, tied))
+    else:
+        top = np.empty(0, dtype=np.intp)
+    top = top[np.lexsort((top, -hit_score[top]))]
+    
+    # Full pair records are only assembled for the pairs that are written out
+    candidate_pairs = []
+    for i, j, val in zip(hit_i[top].tolist(), hit_j[top].tolist(), hit_score[top].tolist()):
+        candidate_pairs.append({
+            'a': names[i],
+            'b': names[j],
+            'similarity_score': val,
+            'a_originals': originals[i],
+            'b_originals': originals[j],
+            'a_top_kol': top_kol[i],
+            'b_top_kol': top_kol[j],
+            'a_top_moein': top_moein[i],
+            'b_top_moein': top_moein[j],
+            'a_joze_samples': joze_samples[i],
+            'b_joze_samples': joze_samples[j],
+            'a_shenaseh': shenaseh[i],
+            'b_shenaseh': shenaseh[j],
+            'a_count': counts[i],
+            'b_count': counts[j]
+        })
     
     # Save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump({'candidate_pairs': candidate_pairs[:50]}, f, ensure_ascii=False, indent=2)  # Top 50
+    write_pairs(args.output, candidate_pairs)
     
-    print(f"Saved to {OUTPUT_FILE}")
+    print(f"Saved to {args.output}")
     
     # Print top 15 for immediate review
     print("\n--- TOP 15 CANDIDATE PAIRS ---")
@@ -1,10 +1,23 @@
 import pandas as pd
 
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITER_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_WRITER_ENGINE = "openpyxl"
+
 file = r'f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\تملک دارایی سرمایه ای.xlsx'
 output_path = r'f:\Freelancing_Project\KalaniProject\municipality_demo\scripts'
 
 # Load data
-df = pd.read_excel(file, sheet_name='سرمایه ای')
+# All columns are kept: the analysis lists them and the export writes full rows
+df = pd.read_excel(file, sheet_name='سرمایه ای', engine=EXCEL_READER_ENGINE)
 
 # Analysis file
 with open(f'{output_path}/budget_analysis.txt', 'w', encoding='utf-8') as f:
@@ -44,7 +57,7 @@ with open(f'{output_path}/budget_analysis.txt', 'w', encoding='utf-8') as f:
 
 # Export Region 14 data
 if len(r14_df) > 0:
-    r14_df.to_excel(f'{output_path}/Region14_Capital_Budget.xlsx', index=False)
+    r14_df.to_excel(f'{output_path}/Region14_Capital_Budget.xlsx', index=False, engine=EXCEL_WRITER_ENGINE)
     print(f'Exported {len(r14_df)} Region 14 rows to Region14_Capital_Budget.xlsx')
 
 print('Analysis complete. See budget_analysis.txt')
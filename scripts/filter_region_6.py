@@ -1,25 +1,39 @@
 import pandas as pd
 import sys
 
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITER_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_WRITER_ENGINE = "openpyxl"
+
 SOURCE_FILE = r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\اطلاعات حسابداری1404.xlsx"
 OUTPUT_FILE = r"f:\Freelancing_Project\KalaniProject\municipality_demo\data\reports\Region6_1404.xlsx"
 SHEET_NAME = "سایر مناطق"
 TARGET_REGION = "شهرداری منطقه شش"
 
+# Standardize Ye/Ke and Latin digits to Persian digits in one translate pass
+_NORMALIZE_TRANS = str.maketrans({'ي': 'ی', 'ك': 'ک', **dict(zip('0123456789', '۰۱۲۳۴۵۶۷۸۹'))})
+
 def normalize_text(text):
     if pd.isna(text): return ""
-    text = str(text)
-    # Standardize Ye and Ke
-    text = text.replace('ي', 'ی').replace('ك', 'ک')
-    # Standardize numbers
-    text = text.replace('1', '۱').replace('2', '۲').replace('3', '۳').replace('4', '۴').replace('5', '۵').replace('6', '۶').replace('7', '۷').replace('8', '۸').replace('9', '۹').replace('0', '۰')
-    return text.strip()
+    return str(text).translate(_NORMALIZE_TRANS).strip()
+
+def normalize_series(values):
+    """Column-wise normalize_text; missing values become ''."""
+    return values.fillna('').astype(str).str.translate(_NORMALIZE_TRANS).str.strip()
 
 def main():
     print(f"Loading {SOURCE_FILE}...")
     try:
         # Load all sheets to check for existence
-        xls = pd.ExcelFile(SOURCE_FILE)
+        xls = pd.ExcelFile(SOURCE_FILE, engine=EXCEL_READER_ENGINE)
         if SHEET_NAME not in xls.sheet_names:
             print(f"Error: Sheet '{SHEET_NAME}' not found. Available sheets: {xls.sheet_names}")
             # Try to find a close match
@@ -45,17 +59,10 @@ def main():
 
         # Filter
         # Create a normalized temporary column for filtering
-        df['norm_region'] = df[col_name].apply(normalize_text)
-        target_norm = normalize_text(TARGET_REGION)
-
-        # Try exact match first
-        filtered_df = df[df['norm_region'] == target_norm]
-        
-        # If no matches, maybe it uses digits? 'شهرداری منطقه 6'
-        if len(filtered_df) == 0:
-            print(f"No rows found matches '{target_norm}'. Checking for numeric variants...")
-            target_variant = normalize_text("شهرداری منطقه 6")
-            filtered_df = df[df['norm_region'] == target_variant]
+        df['norm_region'] = normalize_series(df[col_name])
+        # Match the spelled-out name and its numeric variant ('شهرداری منطقه 6') in one pass
+        targets = {normalize_text(TARGET_REGION), normalize_text("شهرداری منطقه 6")}
+        filtered_df = df[df['norm_region'].isin(targets)]
         
         if len(filtered_df) == 0:
             print(f"Warning: No data found for region '{TARGET_REGION}'.")
@@ -67,7 +74,7 @@ def main():
             
             # Export
             print(f"Found {len(final_df)} rows. Saving to {OUTPUT_FILE}...")
-            final_df.to_excel(OUTPUT_FILE, index=False)
+            final_df.to_excel(OUTPUT_FILE, index=False, engine=EXCEL_WRITER_ENGINE)
             print("Done.")
 
     except Exception as e:
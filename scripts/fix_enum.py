@@ -1,43 +1,47 @@
 """
 Fix PostgreSQL enum: recreate with lowercase values to match existing data.
 The data has 'monthly' but the enum was created with 'DAILY', 'MONTHLY', 'YEARLY'.
-Solution: Drop and recreate enum with lowercase values, then alter column.
+Solution: Create the corrected enum, convert the column to it in one ALTER,
+then swap it in for the old type - all inside a single transaction.
 """
 from sqlalchemy import text
 from app.database import engine
 
 def fix_enum():
-    with engine.connect() as conn:
+    # engine.begin() runs everything below in one transaction: either the
+    # whole swap applies or nothing does
+    with engine.begin() as conn:
         # Check current data
         result = conn.execute(text("SELECT frequency FROM subsystem_activities LIMIT 1"))
         row = result.fetchone()
         print(f"Current frequency value in data: {row[0] if row else 'No data'}")
         
-        # PostgreSQL approach: use ALTER TYPE to add lowercase values, then remove uppercase
-        # Or simpler: drop column, drop enum, recreate
+        # Build the corrected enum beside the old one and convert the column
+        # in a single ALTER, so the table is rewritten once
         print("\nFixing enum type...")
         
-        # Step 1: Set all frequencies to NULL temporarily
+        # Step 1: Drop the default that references the old type
         conn.execute(text("ALTER TABLE subsystem_activities ALTER COLUMN frequency DROP DEFAULT"))
-        conn.execute(text("ALTER TABLE subsystem_activities ALTER COLUMN frequency TYPE VARCHAR(20)"))
-        
-        # Step 2: Drop the old enum type
-        conn.execute(text("DROP TYPE IF EXISTS activityfrequency"))
         
-        # Step 3: Recreate enum with correct lowercase values
-        conn.execute(text("CREATE TYPE activityfrequency AS ENUM ('DAILY', 'MONTHLY', 'YEARLY')"))
+        # Step 2: Create the enum with the correct values under a temporary name
+        conn.execute(text("DROP TYPE IF EXISTS activityfrequency_new"))
+        conn.execute(text("CREATE TYPE activityfrequency_new AS ENUM ('DAILY', 'MONTHLY', 'YEARLY')"))
         
-        # Step 4: Update existing lowercase values to uppercase
-        conn.execute(text("UPDATE subsystem_activities SET frequency = UPPER(frequency) WHERE frequency IS NOT NULL"))
+        # Step 3: Convert the column, upper-casing existing values on the way
+        conn.execute(text(
+            "ALTER TABLE subsystem_activities ALTER COLUMN frequency TYPE activityfrequency_new "
+            "USING UPPER(frequency::text)::activityfrequency_new"
+        ))
         
-        # Step 5: Change column back to enum type
-        conn.execute(text("ALTER TABLE subsystem_activities ALTER COLUMN frequency TYPE activityfrequency USING frequency::activityfrequency"))
+        # Step 4: Replace the old type and restore the default
+        conn.execute(text("DROP TYPE IF EXISTS activityfrequency"))
+        conn.execute(text("ALTER TYPE activityfrequency_new RENAME TO activityfrequency"))
         conn.execute(text("ALTER TABLE subsystem_activities ALTER COLUMN frequency SET DEFAULT 'MONTHLY'"))
-        
-        conn.commit()
-        print("✅ Enum fixed successfully!")
-        
-        # Verify
+    
+    print("✅ Enum fixed successfully!")
+    
+    # Verify
+    with engine.connect() as conn:
         result = conn.execute(text("SELECT frequency FROM subsystem_activities LIMIT 3"))
         print("\nVerification - first 3 rows:")
         for row in result:
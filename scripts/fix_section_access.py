@@ -29,23 +29,27 @@ def main():
     
     print("\n=== Adding SectionSubsystemAccess entries ===")
     
+    # One query for every existing mapping of this subsystem
+    existing = {
+        section_id
+        for (section_id,) in db.query(models.SectionSubsystemAccess.section_id).filter(
+            models.SectionSubsystemAccess.subsystem_id == subsystem_id,
+            models.SectionSubsystemAccess.section_id.in_(section_ids)
+        ).all()
+    }
+    
+    new_mappings = []
     for section_id in section_ids:
-        # Check if mapping already exists
-        existing = db.query(models.SectionSubsystemAccess).filter(
-            models.SectionSubsystemAccess.section_id == section_id,
-            models.SectionSubsystemAccess.subsystem_id == subsystem_id
-        ).first()
-        
-        if existing:
+        if section_id in existing:
             print(f"  [EXISTS] Section {section_id} -> Subsystem {subsystem_id}")
         else:
-            mapping = models.SectionSubsystemAccess(
+            new_mappings.append(models.SectionSubsystemAccess(
                 section_id=section_id,
                 subsystem_id=subsystem_id
-            )
-            db.add(mapping)
+            ))
             print(f"  [ADDED] Section {section_id} -> Subsystem {subsystem_id}")
     
+    db.bulk_save_objects(new_mappings)
     db.commit()
     
     print("\n=== Verification ===")
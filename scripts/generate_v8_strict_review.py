@@ -11,13 +11,35 @@ Usage:
     python scripts/generate_v8_strict_review.py
 """
 
+import pandas as pd
 from openpyxl import load_workbook, Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 import re
-from collections import defaultdict, Counter
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
 from typing import Optional, List, Dict, Tuple, Set
 
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 
 # ============================================================
 # CONFIGURATION
@@ -31,15 +53,43 @@ OUTPUT_FILE = "فایل_بررسی_نهایی_V8_با_فیلتر_رنگ.xlsx"
 MIN_CLUSTER_SIZE = 3
 MIN_PREFIX_WORDS = 3
 
+# نوع ردیف value of the rows kept from the capital file
+CONTINUOUS_ROW_TYPE = "مستمر"
+
 # Persian connector words
 CONNECTOR_WORDS = {"و", "در", "به", "از", "با", "برای", "های", "جهت", "روی", "تا"}
 
+# Noise removed before taking prefixes
+_DIGITS_RE = re.compile(r'\d+')
+_PARENS_RE = re.compile(r'\(.*?\)')
+_PUNCT_RE = re.compile(r'[،,\-_:؛]')
+
 # Valid colors (White or No Fill)
 # No Fill: index = '00000000', rgb = None, theme = None
 # White: index = 'FFFFFFFF' or RGB = 'FFFFFF'
 VALID_COLOR_INDICES = {'00000000', '00000000', 0, None}
 VALID_COLOR_RGB = {'FFFFFFFF', 'FFFFFF', 'ffffff', None, '00000000'}
 
+# Output columns, in sheet order, and their widths
+OUTPUT_HEADERS = ['سامانه', 'شرح_اصلی', 'عنوان_پیشنهادی', 'نوع_بودجه', 'تکرار']
+OUTPUT_COLUMN_WIDTHS = [28, 55, 40, 20, 10]
+
+# Output styles (shared by every cell that uses them)
+HEADER_FONT = Font(bold=True, size=11, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
+HEADER_ALIGN = Alignment(horizontal="center", vertical="center", wrap_text=True)
+CELL_ALIGN = Alignment(horizontal="right", vertical="center", wrap_text=True)
+EDITABLE_FILL = PatternFill(start_color="FFFACD", end_color="FFFACD", fill_type="solid")
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+# Arabic Yeh/Kaf -> Persian, applied in a single translate pass
+_PERSIAN_TRANS = str.maketrans({"ي": "ی", "ك": "ک"})
+
 
 # ============================================================
 # CLEANING DICTIONARY (Layer 1)
@@ -84,6 +134,30 @@ CLEANING_MAP = {
 }
 
 
+def _build_cleaning_automaton():
+    """
+    Aho-Corasick automaton over every CLEANING_MAP keyword.
+    Each keyword maps to (priority, clean_title) of its first entry, so the
+    lowest priority found in a description is the title the loop would pick.
+    """
+    automaton = ahocorasick.Automaton()
+    for priority, (clean_title, keywords) in enumerate(CLEANING_MAP.items()):
+        for kw in keywords:
+            if kw not in automaton:
+                automaton.add_word(kw, (priority, clean_title))
+    automaton.make_automaton()
+    return automaton
+
+
+CLEANING_AUTOMATON = _build_cleaning_automaton() if AHOCORASICK_AVAILABLE else None
+
+# Without pyahocorasick: one literal alternation regex per CLEANING_MAP entry
+CLEANING_PATTERNS = [
+    (clean_title, re.compile("|".join(map(re.escape, keywords))))
+    for clean_title, keywords in CLEANING_MAP.items()
+]
+
+
 # ============================================================
 # SUBSYSTEM MAPPING
 # ============================================================
@@ -128,11 +202,29 @@ TRUSTEE_TO_SUBSYSTEM = {
 # COLOR CHECKING UTILITIES
 # ============================================================
 
-def is_white_or_no_fill(cell) -> bool:
+def is_white_or_no_fill(cell, fill_cache: Optional[Dict[int, bool]] = None) -> bool:
     """
     Check if a cell has WHITE or NO FILL background.
     Returns True if valid (white/transparent), False if colored.
+    Read-only cells are answered from fill_cache by fill id; ids are
+    workbook-local, so callers pass one dict per workbook.
     """
+    if fill_cache is None:
+        return _check_cell_fill(cell)
+    try:
+        fill_id = cell.style_array.fillId
+    except Exception:
+        # Empty or non read-only cell: no fill id to cache on
+        return _check_cell_fill(cell)
+    
+    result = fill_cache.get(fill_id)
+    if result is None:
+        result = fill_cache[fill_id] = _check_cell_fill(cell)
+    return result
+
+
+def _check_cell_fill(cell) -> bool:
+    """Color check behind is_white_or_no_fill."""
     try:
         fill = cell.fill
         
@@ -140,72 +232,86 @@ def is_white_or_no_fill(cell) -> bool:
         if fill is None:
             return True
         
-        # Check fill type
-        fill_type = fill.fill_type
-        if fill_type is None or fill_type == 'none':
+        fg_color = fill.fgColor
+        if fg_color is None:
+            return _is_white_fill(fill.fill_type, None, None, None, None)
+        return _is_white_fill(fill.fill_type, fg_color.type, fg_color.rgb,
+                              fg_color.theme, fg_color.indexed)
+        
+    except Exception as e:
+        # If any error, assume it's valid
+        return True
+
+
+def _is_white_fill(fill_type, color_type, rgb, theme, indexed) -> bool:
+    """Color decision for is_white_or_no_fill from the fill's attributes."""
+    # Check fill type
+    if fill_type is None or fill_type == 'none':
+        return True
+    
+    # Check solid fill colors
+    if fill_type == 'solid':
+        if color_type is None:
             return True
         
-        # Check solid fill colors
-        if fill_type == 'solid':
-            fg_color = fill.fgColor
-            
-            if fg_color is None:
+        # Check if it's a theme color (usually means no explicit color)
+        if color_type == 'theme':
+            # Theme 0 is usually white/background
+            if theme == 0:
                 return True
-            
-            # Check if it's a theme color (usually means no explicit color)
-            if fg_color.type == 'theme':
-                # Theme 0 is usually white/background
-                if fg_color.theme == 0:
-                    return True
-                # Other themes might be colored
-                return False
-            
-            # Check RGB value
-            if fg_color.type == 'rgb':
-                rgb = fg_color.rgb
-                if rgb is None:
-                    return True
-                rgb_str = str(rgb).upper()
-                # White: FFFFFFFF or 00000000 (transparent)
-                if rgb_str in ('FFFFFFFF', '00000000', 'FFFFFF'):
-                    return True
-                # Check if it's a light color (near white)
-                if rgb_str.startswith('FF') and len(rgb_str) == 8:
-                    # Extract RGB values
-                    r = int(rgb_str[2:4], 16)
-                    g = int(rgb_str[4:6], 16)
-                    b = int(rgb_str[6:8], 16)
-                    # If very close to white (>250 each), accept as white
-                    if r > 250 and g > 250 and b > 250:
-                        return True
-                return False
-            
-            # Check indexed color
-            if fg_color.type == 'indexed':
-                idx = fg_color.indexed
-                # Index 0 and 64 are typically black/automatic, 
-                # but for background 0 often means no fill
-                if idx in (0, 64, None):
-                    return True
-                return False
+            # Other themes might be colored
+            return False
         
-        return True  # Default to accepting
+        # Check RGB value
+        if color_type == 'rgb':
+            if rgb is None:
+                return True
+            rgb_str = str(rgb).upper()
+            # White: FFFFFFFF or 00000000 (transparent)
+            if rgb_str in ('FFFFFFFF', '00000000', 'FFFFFF'):
+                return True
+            # Check if it's a light color (near white)
+            if rgb_str.startswith('FF') and len(rgb_str) == 8:
+                # Extract RGB values
+                r = int(rgb_str[2:4], 16)
+                g = int(rgb_str[4:6], 16)
+                b = int(rgb_str[6:8], 16)
+                # If very close to white (>250 each), accept as white
+                if r > 250 and g > 250 and b > 250:
+                    return True
+            return False
         
-    except Exception as e:
-        # If any error, assume it's valid
-        return True
+        # Check indexed color
+        if color_type == 'indexed':
+            # Index 0 and 64 are typically black/automatic, 
+            # but for background 0 often means no fill
+            if indexed in (0, 64, None):
+                return True
+            return False
+    
+    return True  # Default to accepting
 
 
 def find_column_index(header_row, keywords: List[str]) -> Optional[int]:
     """Find column index (1-based) that contains any keyword."""
     for idx, cell in enumerate(header_row, start=1):
-        cell_value = str(cell.value or "").strip()
+        cell_value = clean_text(cell.value)
         for kw in keywords:
             if kw in cell_value:
                 return idx
     return None
 
 
+def find_column_name(columns, keywords: List[str]) -> Optional[str]:
+    """find_column_index for DataFrame columns; returns the column label."""
+    for col in columns:
+        col_value = clean_text(col)
+        for kw in keywords:
+            if kw in col_value:
+                return col
+    return None
+
+
 # ============================================================
 # TEXT UTILITIES
 # ============================================================
@@ -214,26 +320,24 @@ def clean_text(text) -> str:
     """Clean and normalize Persian text."""
     if text is None:
         return ""
-    text = str(text).strip()
-    text = text.replace("ي", "ی").replace("ك", "ک")
-    return text
+    return str(text).strip().translate(_PERSIAN_TRANS)
 
 
-def contains_any(text: str, keywords: List[str]) -> bool:
-    """Check if text contains any of the keywords."""
-    if not text:
-        return False
-    return any(kw in text for kw in keywords)
+def clean_series(values: pd.Series) -> pd.Series:
+    """clean_text for a whole column of strings."""
+    return values.str.strip().str.translate(_PERSIAN_TRANS)
 
 
-def extract_prefix(text: str, n: int) -> Optional[str]:
-    """Extract first N words as prefix."""
-    # Remove noise
-    text = re.sub(r'\d+', '', text)
-    text = re.sub(r'\(.*?\)', '', text)
-    text = re.sub(r'[،,\-_:؛]', ' ', text)
-    
-    words = text.split()
+def _prefix_words(text: str) -> List[str]:
+    """Words of text with digits, parentheses and punctuation removed."""
+    text = _DIGITS_RE.sub('', text)
+    text = _PARENS_RE.sub('', text)
+    text = _PUNCT_RE.sub(' ', text)
+    return text.split()
+
+
+def _prefix_of(words: List[str], n: int) -> Optional[str]:
+    """First N words as prefix."""
     if len(words) >= n:
         prefix = ' '.join(words[:n])
         # Don't accept if ends with connector
@@ -246,11 +350,26 @@ def extract_prefix(text: str, n: int) -> Optional[str]:
     return None
 
 
-def classify_to_subsystem(trustee: str, description: str, is_capital: bool) -> str:
-    """Classify row to subsystem."""
+def extract_prefixes(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """4-word and 3-word prefixes, removing noise only once."""
+    words = _prefix_words(text)
+    return _prefix_of(words, 4), _prefix_of(words, 3)
+
+
+@lru_cache(maxsize=None)
+def trustee_subsystem(trustee: str) -> Optional[str]:
+    """Subsystem mapped from the trustee, if any (few distinct trustees, so cached)."""
     for pattern, subsystem in TRUSTEE_TO_SUBSYSTEM.items():
         if pattern in trustee:
             return subsystem
+    return None
+
+
+def classify_to_subsystem(trustee: str, description: str, is_capital: bool) -> str:
+    """Classify row to subsystem."""
+    subsystem = trustee_subsystem(trustee)
+    if subsystem:
+        return subsystem
     
     if "رفاهی" in description or "پاداش" in description:
         return "WELFARE"
@@ -279,16 +398,20 @@ def load_capital_with_color_filter(filepath: str) -> List[dict]:
     2. Row background is WHITE or NO FILL
     """
     print(f"   📂 Loading: {filepath}")
+    # is_white_or_no_fill result per fill id of this workbook
+    fill_cache: Dict[int, bool] = {}
     
     try:
-        wb = load_workbook(filepath, data_only=True)
+        # Read-only mode streams rows instead of building every cell up front;
+        # external link parts are never used, so they are not parsed
+        wb = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
         ws = wb.active
     except Exception as e:
         print(f"   ❌ Error loading file: {e}")
         return []
     
     # Get header row (row 1)
-    header_row = list(ws[1])
+    header_row = next(ws.iter_rows(min_row=1, max_row=1), ())
     
     # Find columns
     desc_col = find_column_index(header_row, ['شرح ردیف', 'شرح'])
@@ -306,41 +429,54 @@ def load_capital_with_color_filter(filepath: str) -> List[dict]:
     color_filtered = 0
     valid_rows = []
     
-    # Iterate through data rows (starting from row 2)
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        total_rows += 1
-        
-        # Get cells
-        desc_cell = row[desc_col - 1] if desc_col else None
-        type_cell = row[type_col - 1] if type_col else None
-        trustee_cell = row[trustee_col - 1] if trustee_col else None
-        
-        # Get values
-        desc_value = clean_text(desc_cell.value) if desc_cell else ""
-        type_value = clean_text(type_cell.value) if type_cell else ""
-        trustee_value = clean_text(trustee_cell.value) if trustee_cell else ""
-        
-        if not desc_value:
-            continue
+    # 0-based positions, resolved once (read-only rows can stop at the
+    # last filled cell, hence the length checks)
+    d_idx = desc_col - 1
+    tr_idx = trustee_col - 1 if trustee_col else None
+    
+    if not type_col:
+        # Without a type column no row can pass the text filter
+        for row in ws.iter_rows(min_row=2):
+            total_rows += 1
+            if d_idx < len(row) and clean_text(row[d_idx].value):
+                text_filtered += 1
+    else:
+        t_idx = type_col - 1
         
-        # FILTER 1: Text condition (نوع ردیف == مستمر)
-        if "مستمر" not in type_value:
-            text_filtered += 1
-            continue
-        
-        # FILTER 2: Color condition (White or No Fill)
-        # Check the first cell in the row as indicator
-        first_cell = row[0]
-        if not is_white_or_no_fill(first_cell):
-            color_filtered += 1
-            continue
-        
-        # Row passed both filters
-        valid_rows.append({
-            'description': desc_value,
-            'trustee': trustee_value,
-            'budget_type': 'capital'
-        })
+        # Iterate through data rows (starting from row 2); each value is only
+        # read and cleaned once the row has passed the checks before it
+        for row in ws.iter_rows(min_row=2):
+            total_rows += 1
+            row_len = len(row)
+            
+            desc_value = clean_text(row[d_idx].value) if d_idx < row_len else ""
+            if not desc_value:
+                continue
+            
+            # FILTER 1: Text condition (نوع ردیف == مستمر)
+            # (usually exactly "مستمر", so try equality before the substring scan)
+            type_value = clean_text(row[t_idx].value) if t_idx < row_len else ""
+            if type_value != CONTINUOUS_ROW_TYPE and CONTINUOUS_ROW_TYPE not in type_value:
+                text_filtered += 1
+                continue
+            
+            # FILTER 2: Color condition (White or No Fill)
+            # Check the first cell in the row as indicator
+            first_cell = row[0]
+            if not is_white_or_no_fill(first_cell, fill_cache):
+                color_filtered += 1
+                continue
+            
+            # Row passed both filters
+            trustee_value = (
+                clean_text(row[tr_idx].value)
+                if tr_idx is not None and tr_idx < row_len else ""
+            )
+            valid_rows.append({
+                'description': desc_value,
+                'trustee': trustee_value,
+                'budget_type': 'capital'
+            })
     
     wb.close()
     
@@ -356,40 +492,28 @@ def load_expense_file(filepath: str) -> List[dict]:
     """Load expense budget file (all rows are valid)."""
     print(f"   📂 Loading: {filepath}")
     
+    # No styles needed here, so the sheet is read column-wise with pandas
     try:
-        wb = load_workbook(filepath, data_only=True)
-        ws = wb.active
+        df = pd.read_excel(filepath, engine=EXCEL_READER_ENGINE, dtype=str, na_filter=False)
     except Exception as e:
         print(f"   ❌ Error: {e}")
         return []
     
-    # Get header row
-    header_row = list(ws[1])
-    
     # Find columns
-    desc_col = find_column_index(header_row, ['شرح ردیف', 'شرح'])
-    trustee_col = find_column_index(header_row, ['متولی', 'متولي'])
+    desc_col = find_column_name(df.columns, ['شرح ردیف', 'شرح'])
+    trustee_col = find_column_name(df.columns, ['متولی', 'متولي'])
     
     if not desc_col:
         print(f"   ⚠️  No description column found!")
         return []
     
-    rows = []
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        desc_cell = row[desc_col - 1] if desc_col else None
-        trustee_cell = row[trustee_col - 1] if trustee_col else None
-        
-        desc_value = clean_text(desc_cell.value) if desc_cell else ""
-        trustee_value = clean_text(trustee_cell.value) if trustee_cell else ""
-        
-        if desc_value:
-            rows.append({
-                'description': desc_value,
-                'trustee': trustee_value,
-                'budget_type': 'expense'
-            })
+    expense = pd.DataFrame({
+        'description': clean_series(df[desc_col]),
+        'trustee': clean_series(df[trustee_col]) if trustee_col else "",
+        'budget_type': 'expense',
+    })
+    rows = expense[expense['description'] != ""].to_dict('records')
     
-    wb.close()
     print(f"   ✅ Loaded: {len(rows)} rows")
     
     return rows
@@ -401,44 +525,36 @@ def load_expense_file(filepath: str) -> List[dict]:
 
 def apply_dictionary(description: str) -> Optional[str]:
     """Layer 1: Check against CLEANING_MAP."""
-    for clean_title, keywords in CLEANING_MAP.items():
-        if contains_any(description, keywords):
+    if CLEANING_AUTOMATON is not None:
+        # All keywords found in a single pass over the description
+        hits = [value for _, value in CLEANING_AUTOMATON.iter(description)]
+        return min(hits)[1] if hits else None
+    for clean_title, pattern in CLEANING_PATTERNS:
+        if pattern.search(description):
             return clean_title
     return None
 
 
 def build_clusters(descriptions: List[str]) -> Dict[str, str]:
     """Layer 2: Build clusters from common prefixes (longest first)."""
-    # Count prefixes of different lengths
-    prefix_counts = Counter()
-    desc_to_prefixes = defaultdict(list)
-    
-    for desc in descriptions:
-        for n in [4, 3]:  # Try 4-word and 3-word prefixes
-            prefix = extract_prefix(desc, n)
-            if prefix:
-                prefix_counts[prefix] += 1
-                desc_to_prefixes[desc].append((n, prefix))
+    # Scan once: (4-word, 3-word) prefixes per description, in input order
+    desc_prefixes = [extract_prefixes(desc) for desc in descriptions]
+    # Counter over a flat iterator counts in C; None marks a missing prefix
+    prefix_counts = Counter(chain.from_iterable(desc_prefixes))
+    prefix_counts.pop(None, None)
     
     # Find valid clusters
     valid_clusters = {p for p, c in prefix_counts.items() if c >= MIN_CLUSTER_SIZE}
     
-    # Assign each description to longest matching cluster
+    # Assign each description to longest matching cluster, falling back to
+    # the raw description
     result = {}
-    for desc, prefixes in desc_to_prefixes.items():
-        prefixes.sort(key=lambda x: x[0], reverse=True)  # Longest first
-        matched = False
-        for _, prefix in prefixes:
-            if prefix in valid_clusters:
-                result[desc] = prefix
-                matched = True
-                break
-        if not matched:
-            result[desc] = desc  # Raw fallback
-    
-    # Handle descriptions with no prefixes
-    for desc in descriptions:
-        if desc not in result:
+    for desc, (p4, p3) in zip(descriptions, desc_prefixes):
+        if p4 in valid_clusters:
+            result[desc] = p4
+        elif p3 in valid_clusters:
+            result[desc] = p3
+        else:
             result[desc] = desc
     
     return result
@@ -447,33 +563,23 @@ def build_clusters(descriptions: List[str]) -> Dict[str, str]:
 def process_all_rows(all_rows: List[dict]) -> List[dict]:
     """Process all rows through the cleaning pipeline."""
     
-    # Count unique descriptions
-    desc_counter = Counter(r['description'] for r in all_rows)
-    
-    # Build lookup for metadata
-    desc_to_meta = {}
-    for row in all_rows:
-        desc = row['description']
-        if desc not in desc_to_meta:
-            is_capital = row['budget_type'] == 'capital'
-            subsystem = classify_to_subsystem(row['trustee'], desc, is_capital)
-            desc_to_meta[desc] = {
-                'subsystem': subsystem,
-                'budget_type': row['budget_type']
-            }
+    rows = pd.DataFrame(all_rows, columns=['description', 'trustee', 'budget_type'])
     
-    # Layer 1: Dictionary matching
-    dict_matched = {}
-    unmatched = []
+    # One entry per unique description (metadata from its first row) with its count
+    descs = rows.drop_duplicates('description').set_index('description')
+    descs['count'] = rows.groupby('description', sort=False).size()
+    is_capital = descs['budget_type'] == 'capital'
+    descs['subsystem'] = [
+        classify_to_subsystem(trustee, desc, capital)
+        for desc, trustee, capital in zip(descs.index, descs['trustee'], is_capital)
+    ]
     
-    for desc in desc_counter.keys():
-        title = apply_dictionary(desc)
-        if title:
-            dict_matched[desc] = title
-        else:
-            unmatched.append(desc)
+    # Layer 1: Dictionary matching
+    descs['suggested'] = [apply_dictionary(desc) for desc in descs.index]
+    dict_matched = descs['suggested'].notna()
+    unmatched = descs.index[~dict_matched].tolist()
     
-    print(f"\n📊 Layer 1 (Dictionary): {len(dict_matched)} matched")
+    print(f"\n📊 Layer 1 (Dictionary): {int(dict_matched.sum())} matched")
     print(f"   Remaining: {len(unmatched)}")
     
     # Layer 2: Clustering
@@ -485,93 +591,124 @@ def process_all_rows(all_rows: List[dict]) -> List[dict]:
     print(f"📊 Layer 3 (Raw/Manual): {raw_count} for review")
     
     # Build output
-    output = []
-    for desc, count in desc_counter.items():
-        meta = desc_to_meta.get(desc, {'subsystem': 'OTHER', 'budget_type': 'unknown'})
-        
-        if desc in dict_matched:
-            suggested = dict_matched[desc]
-        elif desc in clustered:
-            suggested = clustered[desc]
-        else:
-            suggested = desc
-        
-        budget_fa = "عمرانی (سرمایه‌ای)" if meta['budget_type'] == 'capital' else "جاری (هزینه‌ای)"
-        
-        output.append({
-            'سامانه': SUBSYSTEM_NAMES.get(meta['subsystem'], 'سایر'),
-            'شرح_اصلی': desc,
-            'عنوان_پیشنهادی': suggested,
-            'نوع_بودجه': budget_fa,
-            'تکرار': count
-        })
+    suggested = (
+        descs['suggested']
+        .fillna(pd.Series(clustered, dtype=object))
+        .fillna(descs.index.to_series())
+    )
+    output = pd.DataFrame({
+        'سامانه': descs['subsystem'].map(SUBSYSTEM_NAMES).fillna('سایر'),
+        'شرح_اصلی': descs.index.to_series(),
+        'عنوان_پیشنهادی': suggested,
+        'نوع_بودجه': is_capital.map({True: "عمرانی (سرمایه‌ای)", False: "جاری (هزینه‌ای)"}),
+        'تکرار': descs['count'],
+    })
     
-    # Sort by subsystem
-    output.sort(key=lambda x: x['سامانه'])
+    # Sort by subsystem (stable, so first-seen order is kept within a subsystem)
+    output = output.sort_values('سامانه', kind='stable')
     
-    return output
+    return output.to_dict('records')
 
 
 # ============================================================
 # EXCEL OUTPUT
 # ============================================================
 
+def styled_cell(ws, value, style_name: str) -> WriteOnlyCell:
+    """Write-only cell with value and a named style registered on ws's workbook."""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style_name
+    return cell
+
+
 def write_output_excel(data: List[dict], filepath: str):
     """Write data to styled Excel file."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "بررسی فعالیت‌ها"
-    
-    # Headers
-    headers = ['سامانه', 'شرح_اصلی', 'عنوان_پیشنهادی', 'نوع_بودجه', 'تکرار']
-    
-    # Styles
-    header_font = Font(bold=True, size=11, color="FFFFFF")
-    header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    header_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    cell_align = Alignment(horizontal="right", vertical="center", wrap_text=True)
-    editable_fill = PatternFill(start_color="FFFACD", end_color="FFFACD", fill_type="solid")
-    
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    if XLSXWRITER_AVAILABLE:
+        _write_output_xlsxwriter(data, filepath)
+    else:
+        _write_output_openpyxl(data, filepath)
+
+
+def _write_output_xlsxwriter(data: List[dict], filepath: str):
+    """write_output_excel with xlsxwriter, streaming rows in constant-memory mode."""
+    wb = xlsxwriter.Workbook(filepath, {'constant_memory': True})
+    ws = wb.add_worksheet("بررسی فعالیت‌ها")
+    
+    border = {'border': 1}
+    cell_format = {'align': 'right', 'valign': 'vcenter', 'text_wrap': True, **border}
+    header_format = wb.add_format({
+        'bold': True, 'font_size': 11, 'font_color': '#FFFFFF', 'bg_color': '#1F4E79',
+        'align': 'center', 'valign': 'vcenter', 'text_wrap': True, **border
+    })
+    data_format = wb.add_format(cell_format)
+    # Highlight editable column (عنوان_پیشنهادی = column 3)
+    editable_format = wb.add_format({**cell_format, 'bg_color': '#FFFACD'})
+    formats = [data_format, data_format, editable_format, data_format, data_format]
+    
+    for col, width in enumerate(OUTPUT_COLUMN_WIDTHS):
+        ws.set_column(col, col, width)
+    ws.set_default_row(24)
+    ws.set_row(0, 30)
+    ws.freeze_panes(1, 0)
+    ws.right_to_left()
+    
+    ws.write_row(0, 0, OUTPUT_HEADERS, header_format)
+    for row_idx, item in enumerate(data, start=1):
+        for col, (key, fmt) in enumerate(zip(OUTPUT_HEADERS, formats)):
+            ws.write(row_idx, col, item.get(key, ''), fmt)
     
-    # Write headers
-    for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_align
-        cell.border = thin_border
+    wb.close()
+
+
+def _write_output_openpyxl(data: List[dict], filepath: str):
+    """write_output_excel with an openpyxl write-only workbook."""
+    # Write-only: rows are streamed to disk as they are appended
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("بررسی فعالیت‌ها")
     
-    # Write data
-    for row_idx, item in enumerate(data, start=2):
-        for col_idx, key in enumerate(headers, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=item.get(key, ''))
-            cell.alignment = cell_align
-            cell.border = thin_border
-            # Highlight editable column (عنوان_پیشنهادی = column 3)
-            if col_idx == 3:
-                cell.fill = editable_fill
+    # Register each style combination once as a named style
+    header_style = NamedStyle(
+        name="review_header", font=HEADER_FONT, fill=HEADER_FILL,
+        alignment=HEADER_ALIGN, border=THIN_BORDER
+    )
+    data_style = NamedStyle(
+        name="review_data", alignment=CELL_ALIGN, border=THIN_BORDER
+    )
+    # Highlight editable column (عنوان_پیشنهادی = column 3)
+    editable_style = NamedStyle(
+        name="review_editable", fill=EDITABLE_FILL,
+        alignment=CELL_ALIGN, border=THIN_BORDER
+    )
+    for style in (header_style, data_style, editable_style):
+        wb.add_named_style(style)
     
-    # Column widths
-    widths = {'A': 28, 'B': 55, 'C': 40, 'D': 20, 'E': 10}
-    for col, width in widths.items():
-        ws.column_dimensions[col].width = width
+    column_styles = [data_style.name, data_style.name, editable_style.name,
+                     data_style.name, data_style.name]
     
-    # Row heights
-    ws.row_dimensions[1].height = 30
-    for row_idx in range(2, len(data) + 2):
-        ws.row_dimensions[row_idx].height = 24
+    # Sheet layout must be set before any row is written
+    # Column widths
+    for col, width in enumerate(OUTPUT_COLUMN_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
     
     # Freeze header and RTL
     ws.freeze_panes = "A2"
     ws.sheet_view.rightToLeft = True
     
+    # Row heights: data rows use the sheet default
+    ws.sheet_format.defaultRowHeight = 24
+    ws.sheet_format.customHeight = True
+    ws.row_dimensions[1].height = 30
+    
+    # Write headers
+    ws.append([styled_cell(ws, header, header_style.name) for header in OUTPUT_HEADERS])
+    
+    # Write data
+    for item in data:
+        ws.append([
+            styled_cell(ws, item.get(key, ''), style_name)
+            for key, style_name in zip(OUTPUT_HEADERS, column_styles)
+        ])
+    
     wb.save(filepath)
 
 
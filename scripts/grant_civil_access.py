@@ -60,19 +60,23 @@ def main():
                 models.BudgetItem.trustee_section_id == civil_org_unit.id
             ).all()
 
+            # One query for the items this user can already access
+            existing_ids = {
+                budget_item_id for (budget_item_id,) in db.query(models.UserBudgetAccess.budget_item_id).filter(
+                    models.UserBudgetAccess.user_id == civil_user.id
+                )
+            }
+
+            new_access = []
             for budget in civil_budget_items:
-                existing_budget_access = db.query(models.UserBudgetAccess).filter(
-                    models.UserBudgetAccess.user_id == civil_user.id,
-                    models.UserBudgetAccess.budget_item_id == budget.id
-                ).first()
-
-                if not existing_budget_access:
-                    budget_access = models.UserBudgetAccess(
+                if budget.id not in existing_ids:
+                    existing_ids.add(budget.id)
+                    new_access.append(models.UserBudgetAccess(
                         user_id=civil_user.id,
                         budget_item_id=budget.id
-                    )
-                    db.add(budget_access)
+                    ))
                     print(f"Granted budget access: {civil_user.username} -> {budget.budget_code}")
+            db.bulk_save_objects(new_access)
 
         db.commit()
         print("Access granted successfully!")
@@ -45,11 +45,14 @@ def import_account_codes(file_path: str, clear_existing: bool = True):
         
         print(f"\n💾 ذخیره {len(result['unique_codes']):,} کد یکتا...")
         
+        # ردیف‌ها به صورت dict و دسته‌ای درج می‌شوند (بدون نمونه‌های ORM)
+        batch_size = 5000
+        batch = []
         for i, code_data in enumerate(result["unique_codes"]):
             # Parse unique code
             parts = code_data["unique_code"].split("-")
             
-            account_code = models.AccountCode(
+            batch.append(dict(
                 unique_code=code_data["unique_code"],
                 zone_code=parts[0] if len(parts) > 0 else "",
                 category=parts[1] if len(parts) > 1 else "",
@@ -63,13 +66,15 @@ def import_account_codes(file_path: str, clear_existing: bool = True):
                 perm_account_count=code_data["perm_count"],
                 bank_account_count=code_data["bank_count"],
                 is_balanced=code_data["is_balanced"]
-            )
-            db.add(account_code)
+            ))
             
-            if (i + 1) % 500 == 0:
-                print(f"   ذخیره شد: {i + 1:,}")
+            if len(batch) == batch_size:
+                db.bulk_insert_mappings(models.AccountCode, batch)
                 db.commit()
+                batch.clear()
+                print(f"   ذخیره شد: {i + 1:,}")
         
+        db.bulk_insert_mappings(models.AccountCode, batch)
         db.commit()
         
         # آمار نهایی
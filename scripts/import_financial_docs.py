@@ -42,57 +42,55 @@ def import_data():
         # 1. Extract and Seed Reference Data
         print("Extracting reference data...")
         
+        # Existing keys are fetched once per table; new rows are bulk-inserted
         # Budgets
         unique_budgets = df['BodgetNo'].dropna().unique()
         print(f"Found {len(unique_budgets)} unique budgets.")
+        existing = {
+            code for (code,) in
+            db.query(models.BudgetRef.budget_code).filter_by(zone_raw='20')
+        }
+        new_budgets = []
         for b_code in unique_budgets:
             b_code_str = str(b_code)
-            if b_code_str.upper() == 'NULL': continue
-            
-            exists = db.query(models.BudgetRef).filter_by(budget_code=b_code_str, zone_raw='20').first()
-            if not exists:
-                db.add(models.BudgetRef(
-                    zone_raw='20',
-                    budget_code=b_code_str,
-                    title=f"Budget {b_code_str}", # No title in file
-                    row_type='Current' # Default
-                ))
+            if b_code_str.upper() == 'NULL' or b_code_str in existing: continue
+            existing.add(b_code_str)
+            new_budgets.append(dict(
+                zone_raw='20',
+                budget_code=b_code_str,
+                title=f"Budget {b_code_str}", # No title in file
+                row_type='Current' # Default
+            ))
+        db.bulk_insert_mappings(models.BudgetRef, new_budgets)
         
         # Cost Centers (using RadJNam as proxy for now, or TitJNam)
         # User asked for Cost Center. Let's use RadJNam (Beneficiary) as Cost Center title for demo
         unique_costs = df['RadJNam'].dropna().unique()
         print(f"Found {len(unique_costs)} unique cost centers.")
+        existing = {title for (title,) in db.query(models.CostCenterRef.title)}
+        new_costs = []
         for i, c_title in enumerate(unique_costs):
             c_title_str = str(c_title).strip()
-            if c_title_str.upper() == 'NULL': continue
+            if c_title_str.upper() == 'NULL' or c_title_str in existing: continue
+            existing.add(c_title_str)
             
             # Generate sequential code
-            code = f"CC-{i+1:04d}"
-            
-            # We check if title exists
-            exists = db.query(models.CostCenterRef).filter_by(title=c_title_str).first()
-            if not exists:
-                db.add(models.CostCenterRef(
-                    code=code,
-                    title=c_title_str
-                ))
+            new_costs.append(dict(code=f"CC-{i+1:04d}", title=c_title_str))
+        db.bulk_insert_mappings(models.CostCenterRef, new_costs)
 
         # Financial Events (TypDesc)
         unique_events = df['TypDesc'].dropna().unique()
         print(f"Found {len(unique_events)} unique events.")
+        existing = {title for (title,) in db.query(models.FinancialEventRef.title)}
+        new_events = []
         for i, e_title in enumerate(unique_events):
             e_title_str = str(e_title).strip()
-            if e_title_str.upper() == 'NULL': continue
+            if e_title_str.upper() == 'NULL' or e_title_str in existing: continue
+            existing.add(e_title_str)
             
             # Generate sequential code
-            code = f"EVT-{i+1:03d}"
-            
-            exists = db.query(models.FinancialEventRef).filter_by(title=e_title_str).first()
-            if not exists:
-                db.add(models.FinancialEventRef(
-                    code=code,
-                    title=e_title_str
-                ))
+            new_events.append(dict(code=f"EVT-{i+1:03d}", title=e_title_str))
+        db.bulk_insert_mappings(models.FinancialEventRef, new_events)
         
         db.commit()
         print("Reference data seeded.")
@@ -102,61 +100,65 @@ def import_data():
         db.query(models.FinancialDocument).delete()
         db.commit()
 
+        # Build every field as a column, then insert plain mappings in batches
+        def column(col, default):
+            return df[col] if col in df.columns else pd.Series(default, index=df.index)
+
+        def text(col):
+            # Missing and 'NULL' values become ''
+            values = column(col, None)
+            as_str = values.astype(str)
+            return as_str.where(values.notna() & (as_str != 'NULL'), '')
+
+        def optional_text(col):
+            values = column(col, None)
+            return values.astype(str).where(values.notna(), None)
+
+        # Description: "TitJNam - TypDesc", or whichever of the two is present
+        tit = text('TitJNam')
+        typ = text('TypDesc')
+        description = tit.str.cat(typ, sep=" - ").where((tit != '') & (typ != ''), tit + typ)
+
+        # Beneficiary
+        raw_ben = column('RadJNam', '').astype(str)
+        beneficiary = raw_ben.where(raw_ben != 'NULL', '')
+
+        # Amount
+        debit = column('DebitAmnt', '0').astype(str)
+        credit = column('CreditAmnt', '0').astype(str)
+        amount = debit.where(debit.astype(float) > 0, credit)
+
+        budget_code = column('BodgetNo', '').astype(str)
+        budget_code = budget_code.where(budget_code.str.upper() != 'NULL', None)
+
+        docs = pd.DataFrame({
+            'zone_code': column('AreaNo', '').astype(str),
+            'doc_number': column('DocNo', 0),
+            'description': description.str.slice(0, 500),
+            'beneficiary': beneficiary,
+            'amount': amount,
+            'debit': debit,
+            'credit': credit,
+            'budget_code': budget_code,
+            'date_str': column('FinYear', '1403').astype(str),
+
+            # New Columns for Test Mode
+            'rad_code': optional_text('RadJNo'),
+            'tit_code': optional_text('TitTNo'),
+            'tit_title': optional_text('TitTNam'),
+            'opr_code': optional_text('OprCod'),
+            'requests': optional_text('Requests'),
+        }).to_dict('records')
+
         count = 0
-        for index, row in df.iterrows():
-            # Extract fields based on new file columns
-            # AreaNo, DocNo, TitJNam, RadJNam, FinYear
-            
-            zone_code = str(row.get('AreaNo', ''))
-            doc_number = row.get('DocNo', 0)
-            
-            # Description
-            desc_parts = []
-            if pd.notna(row.get('TitJNam')) and str(row.get('TitJNam')) != 'NULL':
-                desc_parts.append(str(row.get('TitJNam')))
-            if pd.notna(row.get('TypDesc')) and str(row.get('TypDesc')) != 'NULL':
-                desc_parts.append(str(row.get('TypDesc')))
-            description = " - ".join(desc_parts)
-            
-            # Beneficiary
-            raw_ben = str(row.get('RadJNam', ''))
-            beneficiary = raw_ben if raw_ben != 'NULL' else ''
-            
-            # Amount
-            debit = str(row.get('DebitAmnt', '0'))
-            credit = str(row.get('CreditAmnt', '0'))
-            amount = debit if float(debit) > 0 else credit
-            
-            budget_code = str(row.get('BodgetNo', ''))
-            if budget_code.upper() == 'NULL': budget_code = None
-
-            # Create record
-            doc = models.FinancialDocument(
-                zone_code=zone_code,
-                doc_number=doc_number,
-                description=description[:500],
-                beneficiary=beneficiary,
-                amount=amount,
-                debit=debit,
-                credit=credit,
-                budget_code=budget_code,
-                date_str=str(row.get('FinYear', '1403')),
-                
-                # New Columns for Test Mode
-                rad_code=str(row.get('RadJNo')) if pd.notna(row.get('RadJNo')) else None,
-                tit_code=str(row.get('TitTNo')) if pd.notna(row.get('TitTNo')) else None,
-                tit_title=str(row.get('TitTNam')) if pd.notna(row.get('TitTNam')) else None,
-                opr_code=str(row.get('OprCod')) if pd.notna(row.get('OprCod')) else None,
-                requests=str(row.get('Requests')) if pd.notna(row.get('Requests')) else None
-            )
-            
-            db.add(doc)
-            count += 1
-            
-            if count % 1000 == 0:
-                print(f"Imported {count} records...")
-                
-        db.commit()
+        batch_size = 5000
+        for start in range(0, len(docs), batch_size):
+            batch = docs[start:start + batch_size]
+            db.bulk_insert_mappings(models.FinancialDocument, batch)
+            db.commit()
+            count += len(batch)
+            print(f"Imported {count} records...")
+
         print(f"Successfully imported {count} records.")
         
     except Exception as e:
@@ -17,6 +17,7 @@ import time
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from openpyxl import load_workbook
+from sqlalchemy import Integer, cast, func, insert
 from app.database import SessionLocal
 from app.models import Contractor
 
@@ -28,6 +29,9 @@ XLSX_PATH = os.path.join(
 # Placeholder national_id prefix
 LEGACY_PREFIX = "LEGACY"
 
+# First-cell values treated as a header row
+HEADER_NAMES = ("نام", "نام پیمانکار", "name", "Name", "شرکت")
+
 # How many rows to commit per batch
 BATCH_SIZE = 500
 
@@ -35,27 +39,29 @@ BATCH_SIZE = 500
 def read_names_from_excel(path: str) -> list[str]:
     """Read contractor names from column A of the first sheet."""
     wb = load_workbook(path, read_only=True, data_only=True)
-    ws = wb.active
-    if ws is None:
-        raise RuntimeError("No active sheet found in the workbook.")
-
-    names: list[str] = []
-    for row in ws.iter_rows(min_col=1, max_col=1, values_only=True):
-        cell_value = row[0]
-        if cell_value is None:
-            continue
-        name = str(cell_value).strip()
-        if name:
-            names.append(name)
-
-    wb.close()
-
-    # Auto-detect header: skip first row if it looks like a header
-    if names and names[0] in ("نام", "نام پیمانکار", "name", "Name", "شرکت"):
-        print(f"  ℹ  Detected header row: '{names[0]}' — skipping it.")
-        names = names[1:]
+    try:
+        ws = wb.active
+        if ws is None:
+            raise RuntimeError("No active sheet found in the workbook.")
+
+        # Stream stripped, non-empty names straight off the sheet
+        rows = ws.iter_rows(min_col=1, max_col=1, values_only=True)
+        names = (
+            name
+            for (cell_value,) in rows
+            if cell_value is not None and (name := str(cell_value).strip())
+        )
 
-    return names
+        # Auto-detect header: skip first name if it looks like a header
+        first = next(names, None)
+        if first is None:
+            return []
+        if first in HEADER_NAMES:
+            print(f"  ℹ  Detected header row: '{first}' — skipping it.")
+            return list(names)
+        return [first, *names]
+    finally:
+        wb.close()
 
 
 def import_contractors():
@@ -80,8 +86,9 @@ def import_contractors():
         return
 
     # ── 2. De-duplicate within the Excel list itself ───────────
+    # (lowercased key, original name), so the key is computed once per name
     seen: set[str] = set()
-    unique_names: list[str] = []
+    unique_names: list[tuple[str, str]] = []
     excel_dupes = 0
     for name in names:
         key = name.lower()
@@ -89,7 +96,7 @@ def import_contractors():
             excel_dupes += 1
             continue
         seen.add(key)
-        unique_names.append(name)
+        unique_names.append((key, name))
 
     if excel_dupes:
         print(f"  ℹ  Removed {excel_dupes} duplicate names within Excel.")
@@ -97,34 +104,36 @@ def import_contractors():
     # ── 3. Check existing names in DB ──────────────────────────
     db = SessionLocal()
     try:
+        # Lowercased by the database, so only the keys cross into Python
         existing_names: set[str] = {
-            row[0].lower()
-            for row in db.query(Contractor.company_name).all()
-            if row[0]
+            name
+            for (name,) in db.query(func.lower(Contractor.company_name))
+            if name
         }
         print(f"  ℹ  Found {len(existing_names)} existing contractors in DB.")
 
-        # Find the highest existing LEGACY-XXXX number to continue from
-        existing_legacy = (
-            db.query(Contractor.national_id)
-            .filter(Contractor.national_id.like(f"{LEGACY_PREFIX}-%"))
-            .all()
+        # Find the highest existing LEGACY-XXXX number to continue from.
+        # Only all-digit suffixes are cast: SQLite would read 'LEGACY-12-X'
+        # as 12 and 'LEGACY-ABC' as 0
+        legacy_seq = cast(
+            func.substr(Contractor.national_id, len(LEGACY_PREFIX) + 2), Integer
         )
-        max_seq = 0
-        for (nid,) in existing_legacy:
-            try:
-                seq = int(nid.split("-", 1)[1])
-                max_seq = max(max_seq, seq)
-            except (ValueError, IndexError):
-                pass
-
-        # ── 4. Build new Contractor objects ────────────────────
-        to_insert: list[Contractor] = []
+        max_seq = (
+            db.query(func.coalesce(func.max(legacy_seq), 0))
+            .filter(
+                Contractor.national_id.op("GLOB")(f"{LEGACY_PREFIX}-[0-9]*"),
+                ~Contractor.national_id.op("GLOB")(f"{LEGACY_PREFIX}-*[^0-9]*"),
+            )
+            .scalar()
+        )
+
+        # ── 4. Build new Contractor rows ───────────────────────
+        to_insert: list[dict] = []
         skipped_db = 0
         seq_counter = max_seq
 
-        for name in unique_names:
-            if name.lower() in existing_names:
+        for key, name in unique_names:
+            if key in existing_names:
                 skipped_db += 1
                 continue
 
@@ -132,12 +141,12 @@ def import_contractors():
             national_id = f"{LEGACY_PREFIX}-{seq_counter:04d}"
 
             to_insert.append(
-                Contractor(
-                    national_id=national_id,
-                    company_name=name,
-                    is_verified=True,
-                    source_system="LEGACY_IMPORT",
-                )
+                {
+                    "national_id": national_id,
+                    "company_name": name,
+                    "is_verified": True,
+                    "source_system": "LEGACY_IMPORT",
+                }
             )
 
         print(f"  ℹ  Skipped {skipped_db} names (already in DB).")
@@ -151,7 +160,7 @@ def import_contractors():
         t0 = time.time()
         for i in range(0, len(to_insert), BATCH_SIZE):
             batch = to_insert[i : i + BATCH_SIZE]
-            db.bulk_save_objects(batch)
+            db.execute(insert(Contractor), batch)
             db.commit()
             print(f"  → Committed batch {i // BATCH_SIZE + 1} "
                   f"({len(batch)} records)")
@@ -12,9 +12,23 @@ Import بودجه از دو فایل اصلی
 
 import pandas as pd
 import re
+from bisect import bisect_right
+from functools import lru_cache
 from app.database import SessionLocal
 from app import models
 
+# تعداد ردیف‌ها بین هر commit
+BATCH_SIZE = 500
+
+# تبدیل ارقام فارسی به لاتین
+PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789')
+
+# الگوهای پاکسازی (یکبار کامپایل می‌شوند)
+_NON_AMOUNT_RE = re.compile(r'[^\d.]')
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+_ZONE_RE = re.compile(r'منطقه\s*(\d+)')
+_TRAILING_NUMBER_RE = re.compile(r'(\d+)\s*$')
+
 
 def clean_amount(value):
     """تبدیل مبلغ به عدد"""
@@ -24,11 +38,9 @@ def clean_amount(value):
     s = str(value).replace(',', '').replace(' ', '').strip()
     
     # تبدیل اعداد فارسی
-    persian = '۰۱۲۳۴۵۶۷۸۹'
-    for i, p in enumerate(persian):
-        s = s.replace(p, str(i))
+    s = s.translate(PERSIAN_DIGITS)
     
-    s = re.sub(r'[^\d.]', '', s)
+    s = _NON_AMOUNT_RE.sub('', s)
     
     try:
         return float(s) if s else 0.0
@@ -36,13 +48,39 @@ def clean_amount(value):
         return 0.0
 
 
+def column(df, name, default=None):
+    """ستون name، یا ستونی با مقدار default اگر در فایل نباشد"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def clean_amount_column(values):
+    """clean_amount برای یک ستون کامل"""
+    s = (
+        values.astype(str)
+        .str.replace(',', '', regex=False)
+        .str.replace(' ', '', regex=False)
+        .str.strip()
+        .str.translate(PERSIAN_DIGITS)
+        .str.replace(_NON_AMOUNT_RE, '', regex=True)
+    )
+    return pd.to_numeric(s, errors='coerce').fillna(0.0)
+
+
+def clean_budget_code_column(values):
+    """clean_budget_code برای یک ستون کامل ('' برای کدهای نامعتبر)"""
+    digits = values.astype(str).str.replace(_NON_DIGIT_RE, '', regex=True)
+    return digits.str.slice(0, 8).where(digits.str.len() >= 4, '')
+
+
 def clean_budget_code(code):
     """استانداردسازی کد بودجه"""
     if pd.isna(code) or code is None:
         return None
     
     s = str(code).strip()
-    s = re.sub(r'[^\d]', '', s)
+    s = _NON_DIGIT_RE.sub('', s)
     
     if len(s) < 4:
         return None
@@ -65,43 +103,72 @@ def parse_zone_from_text(text):
     if "مرکز" in s or "300" in s or "اصفهان" in s.lower():
         return "20"  # امور مالی/مرکزی
     
-    match = re.search(r'منطقه\s*(\d+)', s)
+    match = _ZONE_RE.search(s)
     if match:
         return match.group(1)
     
-    match = re.search(r'(\d+)\s*$', s)
+    match = _TRAILING_NUMBER_RE.search(s)
     if match:
         return match.group(1)
     
     return None
 
 
-def find_trustee_section(trustee_text, db):
-    """پیدا کردن قسمت متولی"""
-    if pd.isna(trustee_text) or not trustee_text:
-        return None
+def build_trustee_finder(db):
+    """
+    ساخت find_trustee_section روی عنوان‌های OrgUnit که یکبار از دیتابیس
+    خوانده می‌شوند (به جای دو کوئری LIKE برای هر سطر)
+    """
+    org_units = [
+        (unit_id, title)
+        for unit_id, title in db.query(models.OrgUnit.id, models.OrgUnit.title).order_by(models.OrgUnit.id)
+        if title
+    ]
     
-    s = str(trustee_text).strip()
+    # همه عنوان‌ها (به همان ترتیب) در یک رشته با جداکننده NUL؛ اولین وقوع
+    # part در آن، در اولین عنوانی است که part را دارد و یک find در C کافی است
+    titles_blob = "\x00".join(title for _, title in org_units)
+    title_starts = []
+    offset = 0
+    for _, title in org_units:
+        title_starts.append(offset)
+        offset += len(title) + 1
     
-    # جستجو در OrgUnit
-    section = db.query(models.OrgUnit).filter(
-        models.OrgUnit.title.contains(s)
-    ).first()
+    def first_unit_containing(part):
+        pos = titles_blob.find(part)
+        if pos < 0 or not org_units:
+            return None
+        return org_units[bisect_right(title_starts, pos) - 1][0]
     
-    if section:
-        return section.id
+    # متن‌های متولی زیاد تکرار می‌شوند
+    @lru_cache(maxsize=None)
+    def find_section(s):
+        # جستجو در OrgUnit
+        section_id = first_unit_containing(s)
+        if section_id:
+            return section_id
+        
+        # جستجوی جزئی
+        for kw in s.split():
+            if len(kw) > 3:
+                section_id = first_unit_containing(kw)
+                if section_id:
+                    return section_id
+        
+        return None
     
-    # جستجوی جزئی
-    keywords = s.split()
-    for kw in keywords:
-        if len(kw) > 3:
-            section = db.query(models.OrgUnit).filter(
-                models.OrgUnit.title.contains(kw)
-            ).first()
-            if section:
-                return section.id
+    def find_trustee_section(trustee_text):
+        """پیدا کردن قسمت متولی"""
+        if pd.isna(trustee_text) or not trustee_text:
+            return None
+        return find_section(str(trustee_text).strip())
     
-    return None
+    return find_trustee_section
+
+
+def load_budget_items(db):
+    """بارگذاری یکجای ردیف‌های بودجه موجود با کلید کد بودجه"""
+    return {item.budget_code: item for item in db.query(models.BudgetItem).all()}
 
 
 def import_hazineei():
@@ -119,25 +186,31 @@ def import_hazineei():
     skipped = 0
     
     try:
-        for idx, row in df.iterrows():
-            budget_code = clean_budget_code(row.get("کد بودجه"))
+        # ردیف‌های موجود یکبار خوانده می‌شوند؛ ردیف‌های جدید هم به همین dict
+        # اضافه می‌شوند تا تکرارهای بعدی همان فایل پیدا شوند
+        budget_items = load_budget_items(db)
+        new_items = []
+        find_trustee_section = build_trustee_finder(db)
+        
+        # پاکسازی ستونی (به جای تابع‌های clean_* برای هر سلول)
+        rows = zip(
+            clean_budget_code_column(column(df, "کد بودجه")),
+            column(df, "شرح ردیف", "").astype(str).str.strip(),
+            clean_amount_column(column(df, "مصوب 1403")),
+            clean_amount_column(column(df, "هزینه 1403")),
+            column(df, "متولی"),
+        )
+        
+        for budget_code, description, allocated, spent, trustee_text in rows:
             if not budget_code:
                 skipped += 1
                 continue
             
-            description = str(row.get("شرح ردیف", "")).strip()
-            allocated = clean_amount(row.get("مصوب 1403"))
-            spent = clean_amount(row.get("هزینه 1403"))
-            trustee_text = row.get("متولی")
-            subject = str(row.get("موضوع", "")).strip()
-            
             # پیدا کردن قسمت متولی
-            trustee_id = find_trustee_section(trustee_text, db)
+            trustee_id = find_trustee_section(trustee_text)
             
             # بررسی وجود قبلی
-            existing = db.query(models.BudgetItem).filter(
-                models.BudgetItem.budget_code == budget_code
-            ).first()
+            existing = budget_items.get(budget_code)
             
             if existing:
                 # بروزرسانی
@@ -161,9 +234,11 @@ def import_hazineei():
                     reserved_amount=0,
                     trustee_section_id=trustee_id
                 )
-                db.add(item)
+                budget_items[budget_code] = item
+                new_items.append(item)
                 success += 1
         
+        db.bulk_save_objects(new_items)
         db.commit()
         print(f"✅ جدید: {success}")
         print(f"🔄 بروزرسانی: {updated}")
@@ -193,31 +268,40 @@ def import_tamalok():
     skipped = 0
     
     try:
-        for idx, row in df.iterrows():
-            budget_code = clean_budget_code(row.get("کد بودجه"))
+        # ردیف‌های موجود یکبار خوانده می‌شوند؛ ردیف‌های جدید هم به همین dict
+        # اضافه می‌شوند تا تکرارهای بعدی همان فایل پیدا شوند
+        budget_items = load_budget_items(db)
+        new_items = []
+        find_trustee_section = build_trustee_finder(db)
+        
+        # پاکسازی ستونی (به جای تابع‌های clean_* برای هر سلول)
+        description = column(df, "شرح ردیف", "").astype(str).str.strip()
+        project_desc = column(df, "شرح پروژه", "").astype(str).str.strip()
+        has_project = (project_desc != '') & (project_desc != 'nan')
+        full_descs = description.where(~has_project, description + " - " + project_desc)
+        
+        rows = zip(
+            clean_budget_code_column(column(df, "کد بودجه")),
+            full_descs,
+            clean_amount_column(column(df, "مصوب 1403")),
+            clean_amount_column(column(df, "هزینه 1403")),
+            column(df, "متولی"),
+            column(df, "منطقه"),
+        )
+        
+        for idx, (budget_code, full_desc, allocated, spent, trustee_text, zone_text) in enumerate(rows):
             if not budget_code:
                 skipped += 1
                 continue
             
-            description = str(row.get("شرح ردیف", "")).strip()
-            project_desc = str(row.get("شرح پروژه", "")).strip()
-            full_desc = f"{description}" + (f" - {project_desc}" if project_desc and project_desc != 'nan' else "")
-            
-            allocated = clean_amount(row.get("مصوب 1403"))
-            spent = clean_amount(row.get("هزینه 1403"))
-            trustee_text = row.get("متولی")
-            zone_text = row.get("منطقه")
-            
             # پیدا کردن قسمت متولی
-            trustee_id = find_trustee_section(trustee_text, db) if pd.notna(trustee_text) else None
+            trustee_id = find_trustee_section(trustee_text) if pd.notna(trustee_text) else None
             
             # استخراج کد منطقه
             zone_code = parse_zone_from_text(zone_text)
             
             # بررسی وجود قبلی - اگر هست، مبالغ رو جمع کن
-            existing = db.query(models.BudgetItem).filter(
-                models.BudgetItem.budget_code == budget_code
-            ).first()
+            existing = budget_items.get(budget_code)
             
             if existing:
                 # Aggregate amounts for duplicates
@@ -246,16 +330,21 @@ def import_tamalok():
                     reserved_amount=0,
                     trustee_section_id=trustee_id
                 )
-                db.add(item)
+                budget_items[budget_code] = item
+                new_items.append(item)
                 success += 1
             
-            # Commit after each row to handle duplicates
-            db.commit()
-            
-            # Progress
-            if (idx + 1) % 500 == 0:
+            # Commit دسته‌ای + Progress (تکرارها در budget_items تجمیع می‌شوند)
+            # ردیف‌های جدید با add_all به session متصل می‌شوند تا تجمیع تکرارهای
+            # دسته‌های بعدی هم روی آن‌ها ذخیره شود
+            if (idx + 1) % BATCH_SIZE == 0:
+                db.add_all(new_items)
+                new_items.clear()
+                db.commit()
                 print(f"   پردازش: {idx + 1} / {len(df)}")
         
+        db.add_all(new_items)
+        db.commit()
         print(f"✅ جدید: {success}")
         print(f"🔄 بروزرسانی/تجمیع: {updated}")
         print(f"⏭️ رد شده: {skipped}")
@@ -15,8 +15,10 @@ Usage:
 """
 
 import pandas as pd
+from sqlalchemy import insert
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Add parent path for imports
@@ -25,6 +27,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.database import SessionLocal, engine
 from app import models
 
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READER_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READER_ENGINE = "openpyxl"
+
 # Configuration
 EXCEL_FILE = "Hesabdary Information.xlsx"
 BATCH_SIZE = 5000  # Commit every N records for memory efficiency
@@ -70,6 +78,13 @@ def clean_str(val):
 
 def clean_int_code(val):
     """Convert float/int to string code, preserving precision."""
+    # Fast path for numeric cells (the common case): no pd.isna call and
+    # no str -> float round trip
+    if isinstance(val, float):
+        if val != val:  # NaN
+            return None
+        if val.is_integer():
+            return str(int(val))
     if pd.isna(val):
         return None
     try:
@@ -97,13 +112,13 @@ def extract_year(date_str):
     return parts[0] if len(parts) >= 1 else "1403"
 
 
-def build_description(row):
+def build_description(titj_desc, request_type):
     """Build description from multiple fields."""
     parts = []
-    titj_desc = clean_str(row.get('titj_desc'))
+    titj_desc = clean_str(titj_desc)
     if titj_desc:
         parts.append(titj_desc)
-    request_type = clean_str(row.get('request_type'))
+    request_type = clean_str(request_type)
     if request_type:
         parts.append(request_type)
     return " - ".join(parts)[:500] if parts else ""
@@ -113,60 +128,73 @@ def seed_reference_data(db, df):
     """Extract and seed reference data from the dataframe."""
     print("\n📊 Extracting reference data...")
     
+    # Existing keys (and the code counters) are read once per table
     # 1. Budget codes
     unique_budgets = df['budget_code'].dropna().unique()
-    budget_count = 0
+    existing = {code for (code,) in db.query(models.BudgetRef.budget_code)}
+    new_refs = []
     for b_code in unique_budgets:
         b_code_str = clean_int_code(b_code)
-        if not b_code_str:
+        if not b_code_str or b_code_str in existing:
             continue
-        exists = db.query(models.BudgetRef).filter_by(budget_code=b_code_str).first()
-        if not exists:
-            db.add(models.BudgetRef(
-                zone_raw='all',
-                budget_code=b_code_str,
-                title=f"Budget {b_code_str}",
-                row_type='Current'
-            ))
-            budget_count += 1
+        existing.add(b_code_str)
+        new_refs.append(models.BudgetRef(
+            zone_raw='all',
+            budget_code=b_code_str,
+            title=f"Budget {b_code_str}",
+            row_type='Current'
+        ))
+    budget_count = len(new_refs)
     print(f"   → BudgetRef: {budget_count} new entries")
     
     # 2. Cost centers
     unique_costs = df['cost_center_desc'].dropna().unique()
+    existing = {title for (title,) in db.query(models.CostCenterRef.title)}
+    max_id = db.query(models.CostCenterRef).count()
     cost_count = 0
     for c_title in unique_costs:
         c_title_str = clean_str(c_title)
-        if not c_title_str:
+        if not c_title_str or c_title_str in existing:
             continue
-        exists = db.query(models.CostCenterRef).filter_by(title=c_title_str).first()
-        if not exists:
-            # Generate sequential code
-            max_id = db.query(models.CostCenterRef).count()
-            code = f"CC-{max_id + cost_count + 1:04d}"
-            db.add(models.CostCenterRef(code=code, title=c_title_str))
-            cost_count += 1
+        existing.add(c_title_str)
+        # Generate sequential code
+        code = f"CC-{max_id + cost_count + 1:04d}"
+        new_refs.append(models.CostCenterRef(code=code, title=c_title_str))
+        cost_count += 1
     print(f"   → CostCenterRef: {cost_count} new entries")
     
     # 3. Financial events (request types)
     unique_events = df['request_type'].dropna().unique()
+    existing = {title for (title,) in db.query(models.FinancialEventRef.title)}
+    max_id = db.query(models.FinancialEventRef).count()
     event_count = 0
     for e_title in unique_events:
         e_title_str = clean_str(e_title)
-        if not e_title_str:
+        if not e_title_str or e_title_str in existing:
             continue
-        exists = db.query(models.FinancialEventRef).filter_by(title=e_title_str).first()
-        if not exists:
-            # Generate sequential code
-            max_id = db.query(models.FinancialEventRef).count()
-            code = f"EVT-{max_id + event_count + 1:03d}"
-            db.add(models.FinancialEventRef(code=code, title=e_title_str))
-            event_count += 1
+        existing.add(e_title_str)
+        # Generate sequential code
+        code = f"EVT-{max_id + event_count + 1:03d}"
+        new_refs.append(models.FinancialEventRef(code=code, title=e_title_str))
+        event_count += 1
     print(f"   → FinancialEventRef: {event_count} new entries")
     
+    db.add_all(new_refs)
     db.commit()
     return budget_count + cost_count + event_count
 
 
+def read_sheet(sheet_name):
+    """Parse one sheet of EXCEL_FILE (runs in a worker process)."""
+    # Only the mapped columns are parsed; the rest are never decoded
+    return pd.read_excel(
+        EXCEL_FILE,
+        sheet_name=sheet_name,
+        engine=EXCEL_READER_ENGINE,
+        usecols=lambda col: col in COLUMN_MAP,
+    )
+
+
 def import_sheet(db, df, sheet_name):
     """Import financial documents from a single sheet."""
     print(f"\n📥 Importing sheet: {sheet_name} ({len(df)} rows)")
@@ -181,26 +209,54 @@ def import_sheet(db, df, sheet_name):
     skipped = 0
     errors = 0
     
-    for idx, row in df.iterrows():
+    # One executemany INSERT per batch instead of an ORM object per row
+    batch = []
+    
+    def flush_batch():
+        if batch:
+            db.execute(insert(models.FinancialDocument), batch)
+            batch.clear()
+        db.commit()
+    
+    # Each column is pulled out once as an array; rows are walked by position
+    def column(name, default=None):
+        if name in df.columns:
+            return df[name].to_numpy()
+        return [default] * len(df)
+    
+    rows = zip(
+        df.index,
+        column('zone_code'), column('doc_number', 0), column('request_id'),
+        column('titj_desc'), column('request_type'), column('cost_center_desc'),
+        column('debit', 0), column('credit', 0), column('budget_code'),
+        column('date_str'), column('radj_no'), column('titt_no'),
+        column('titt_desc'), column('operator'),
+    )
+    
+    for (idx, zone_code, doc_number, request_id,
+         titj_desc, request_type, cost_center_desc,
+         debit, credit, budget_code,
+         date_str, radj_no, titt_no,
+         titt_desc, operator) in rows:
         try:
-            zone_code = clean_int_code(row.get('zone_code'))
-            doc_number = int(clean_float(row.get('doc_number', 0)))
-            request_id = clean_str(row.get('request_id'))
+            zone_code = clean_int_code(zone_code)
+            doc_number = int(clean_float(doc_number))
+            request_id = clean_str(request_id)
             
             if not zone_code:
                 skipped += 1
                 continue
             
             # Build document
-            description = build_description(row)
-            beneficiary = clean_str(row.get('cost_center_desc')) or ""
-            debit = str(int(clean_float(row.get('debit', 0))))
-            credit = str(int(clean_float(row.get('credit', 0))))
+            description = build_description(titj_desc, request_type)
+            beneficiary = clean_str(cost_center_desc) or ""
+            debit = str(int(clean_float(debit)))
+            credit = str(int(clean_float(credit)))
             amount = debit if int(debit) > 0 else credit
-            budget_code = clean_int_code(row.get('budget_code'))
+            budget_code = clean_int_code(budget_code)
             
-            # Create document
-            doc = models.FinancialDocument(
+            # Document row (plain values, inserted in batches below)
+            batch.append(dict(
                 zone_code=zone_code,
                 doc_number=doc_number,
                 description=description,
@@ -209,19 +265,18 @@ def import_sheet(db, df, sheet_name):
                 debit=debit,
                 credit=credit,
                 budget_code=budget_code,
-                date_str=extract_year(row.get('date_str')),
-                rad_code=clean_int_code(row.get('radj_no')),
-                tit_code=clean_int_code(row.get('titt_no')),
-                tit_title=clean_str(row.get('titt_desc')),
-                opr_code=clean_str(row.get('operator')),
+                date_str=extract_year(date_str),
+                rad_code=clean_int_code(radj_no),
+                tit_code=clean_int_code(titt_no),
+                tit_title=clean_str(titt_desc),
+                opr_code=clean_str(operator),
                 requests=request_id
-            )
-            db.add(doc)
+            ))
             imported += 1
             
-            # Batch commit for memory efficiency
-            if imported % BATCH_SIZE == 0:
-                db.commit()
+            # Batch insert + commit for memory efficiency
+            if len(batch) == BATCH_SIZE:
+                flush_batch()
                 print(f"   → Progress: {imported} imported, {skipped} skipped...")
                 
         except Exception as e:
@@ -229,7 +284,7 @@ def import_sheet(db, df, sheet_name):
             if errors <= 5:  # Only print first 5 errors
                 print(f"   ⚠️ Error at row {idx}: {e}")
     
-    db.commit()
+    flush_batch()
     print(f"   ✅ Sheet complete: {imported} imported, {skipped} skipped, {errors} errors")
     return imported, skipped, errors
 
@@ -254,26 +309,44 @@ def main():
     try:
         # Option: Clear existing documents (comment out for incremental import)
         print("\n🗑️ Clearing existing financial documents...")
-        existing_count = db.query(models.FinancialDocument).count()
-        db.query(models.FinancialDocument).delete()
+        # One unfiltered DELETE (SQLite truncates the table); it returns the row count
+        existing_count = db.query(models.FinancialDocument).delete()
         db.commit()
         print(f"   → Deleted {existing_count} existing records")
         
         # Load Excel file
         print("\n📂 Loading Excel file (this may take a while)...")
-        xls = pd.ExcelFile(EXCEL_FILE)
-        print(f"   → Found {len(xls.sheet_names)} sheets: {', '.join(xls.sheet_names)}")
+        with pd.ExcelFile(EXCEL_FILE, engine=EXCEL_READER_ENGINE) as xls:
+            sheet_names = xls.sheet_names
+        print(f"   → Found {len(sheet_names)} sheets: {', '.join(sheet_names)}")
         
         total_imported = 0
         total_skipped = 0
         total_errors = 0
         
-        for sheet_name in xls.sheet_names:
-            df = pd.read_excel(EXCEL_FILE, sheet_name=sheet_name)
-            imported, skipped, errors = import_sheet(db, df, sheet_name)
-            total_imported += imported
-            total_skipped += skipped
-            total_errors += errors
+        # Secondary indexes are dropped for the bulk load and rebuilt once afterwards
+        doc_indexes = models.FinancialDocument.__table__.indexes
+        for index in doc_indexes:
+            index.drop(bind=engine, checkfirst=True)
+        
+        # Sheets are parsed in parallel worker processes; each one is imported
+        # here (in sheet order) as soon as its parse is done
+        workers = max(1, min(len(sheet_names), os.cpu_count() or 1))
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                frames = pool.map(read_sheet, sheet_names)
+                for sheet_name, df in zip(sheet_names, frames):
+                    imported, skipped, errors = import_sheet(db, df, sheet_name)
+                    total_imported += imported
+                    total_skipped += skipped
+                    total_errors += errors
+        finally:
+            # Release any open write transaction (a no-op once every batch is
+            # committed) so the indexes can be rebuilt, even on KeyboardInterrupt
+            db.rollback()
+            print("\n🔧 Rebuilding financial document indexes...")
+            for index in doc_indexes:
+                index.create(bind=engine, checkfirst=True)
         
         # Summary
         print("\n" + "=" * 60)